@@ -1,410 +1,317 @@
+import time
+STARTUP_BEGIN = time.perf_counter()
+
+import asyncio
 import getpass
 import gradio as gr
-import openai
+import json
 import random
-import speech_recognition as sr
 import logging
+import os
+import argparse
 import re
-import tempfile
-from gtts import gTTS
-import time
-
-# Prompt for OpenAI API key at the very start
-openai_key = getpass.getpass("🔑 Please enter your OpenAI API key: ")
-if not openai_key or not openai_key.startswith("sk-"):
-    raise ValueError("A valid OpenAI API key must be provided to run this app.")
-
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)  # Keep DEBUG for troubleshooting
-client = openai.OpenAI(api_key=openai_key)
+import sys
+import threading
+from collections import OrderedDict
+
+# Set up logging before the local modules below, which log while they initialize
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
+
+import history
+import metrics
+import singleflight
+import speech
+import tts
+from cache import SemanticCache, SQLiteCache, TTLCache, make_cache_key, make_index_key
+from concepts import get_concepts
+from latex import LatexStreamCleaner, clean_latex
+from urdu import is_roman_urdu
+
+OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", "200"))
+GRADIO_CONCURRENCY_LIMIT = int(os.environ.get("GRADIO_CONCURRENCY_LIMIT", "100"))
 MODEL = "gpt-3.5-turbo-0125"
+client = None
+
+def load_openai_key():
+    # Read from the environment so the app can start unattended; only ask when run by hand
+    openai_key = os.environ.get("OPENAI_API_KEY", "")
+    if not openai_key and sys.stdin.isatty():
+        openai_key = getpass.getpass("🔑 Please enter your OpenAI API key: ")
+    if not openai_key or not openai_key.startswith("sk-"):
+        raise ValueError("A valid OpenAI API key must be provided in OPENAI_API_KEY to run this app.")
+    # Kept for get_client, which runs inside an async handler and must never prompt
+    os.environ["OPENAI_API_KEY"] = openai_key
+    return openai_key
+
+def get_client():
+    # Created on first use: importing openai is slow and the key may not be needed yet.
+    # One shared async client, so its connection pool is reused by every in-flight request.
+    global client
+    if client is None:
+        import httpx
+        import openai
+        client = openai.AsyncOpenAI(
+            api_key=load_openai_key(),
+            http_client=openai.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=OPENAI_MAX_CONNECTIONS // 2
+                )
+            )
+        )
+    return client
+
+# Shared across sessions: repeated classroom questions are served without an API call
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", "2048"))
+CACHE_TTL = int(os.environ.get("CACHE_TTL", str(24 * 3600)))  # seconds
+# "sqlite" keeps the caches in CACHE_PATH so they are already warm after a restart
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+CACHE_PATH = os.environ.get("CACHE_PATH", "response_cache.sqlite3")
+
+def make_cache(name):
+    if CACHE_BACKEND == "sqlite":
+        cache = SQLiteCache(name, CACHE_PATH, CACHE_MAX_ENTRIES, CACHE_TTL)
+        dropped = cache.compact()
+        logging.info(f"Loaded {len(cache)} cached {name} entries from {CACHE_PATH} ({dropped} expired or surplus entries dropped)")
+        return cache
+    return TTLCache(name, CACHE_MAX_ENTRIES, CACHE_TTL)
+
+answer_cache = make_cache("answer")
+topic_cache = make_cache("topic")
+fun_fact_cache = make_cache("fun_fact")
+# The three caches share CACHE_PATH: reclaim the space they just freed in one pass
+if CACHE_BACKEND == "sqlite" and answer_cache.vacuum():
+    logging.info(f"Vacuumed {CACHE_PATH}")
+
+# Near-duplicate questions ("what's photosynthesis", "Photosynthesis?") reuse the cached answer
+SEMANTIC_CACHE_ENABLED = os.environ.get("SEMANTIC_CACHE", "1") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+semantic_cache = SemanticCache(
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    capacity=int(os.environ.get("SEMANTIC_CACHE_SIZE", "512"))
+)
+
+def collect_cache_metrics():
+    for cache in (answer_cache, topic_cache, fun_fact_cache, semantic_cache):
+        stats = cache.stats()
+        for field in ("hits", "misses", "evictions", "size"):
+            yield f"cache_{field}", {"cache": stats["name"]}, stats[field]
+    for field, value in tts.audio_store.stats().items():
+        yield f"audio_cache_{field}", {}, value
+    yield "active_sessions", {}, len(sessions)
+    for flights in (answer_flights, fun_fact_flights):
+        yield "in_flight_requests", {"call": flights.name}, len(flights)
+
+metrics.register_collector(collect_cache_metrics)
+
+# --- Per-session state ---
+# Every browser tab gets its own state, keyed by Gradio's session hash, so
+# concurrent students never overwrite each other's question or AI concept.
+MAX_SESSIONS = int(os.environ.get("MAX_SESSIONS", "500"))
+SESSION_IDLE_TIMEOUT = int(os.environ.get("SESSION_IDLE_TIMEOUT", "1800"))  # seconds
+
+sessions = OrderedDict()
+sessions_lock = threading.Lock()
+
+def new_session_state():
+    return {
+        "grade": None,
+        "subject": None,
+        "question": "",
+        "language": "english",
+        "cache_key": None,
+        "fun_fact_topic": None,
+        "conversation_history": history.ConversationHistory(),
+        "prefetch_task": None,
+        "ai_state": {"index": 0, "order": None, "active": False},
+        "last_seen": time.time()
+    }
+
+def get_session(request):
+    session_id = getattr(request, "session_hash", None) or "local"
+    now = time.time()
+    with sessions_lock:
+        session = sessions.pop(session_id, None)
+        if session is None:
+            session = new_session_state()
+        session["last_seen"] = now
+        sessions[session_id] = session
+        # Sessions are kept in least-recently-used order, so idle ones sit at the front
+        while sessions:
+            oldest_id, oldest = next(iter(sessions.items()))
+            if len(sessions) <= MAX_SESSIONS and now - oldest["last_seen"] <= SESSION_IDLE_TIMEOUT:
+                break
+            del sessions[oldest_id]
+            cancel_prefetch(oldest)
+            logging.debug("Evicted session %s", oldest_id)
+    return session
+
+def end_session(request: gr.Request):
+    session_id = getattr(request, "session_hash", None)
+    with sessions_lock:
+        session = sessions.pop(session_id, None)
+    if session is not None:
+        cancel_prefetch(session)
+    logging.debug("Session %s closed, %d active", session_id, len(sessions))
 
 # --- AI Learning Mode: Grade-specific explanations and real-life applications ---
-AI_CONCEPTS = [
-    {
-        "concept": "Artificial Intelligence",
-        "explanation_3": "AI is like a smart robot that learns by watching you play! It can copy what you do to get better every day. 🤖",
-        "explanation_4": "AI means computers can learn from examples and do tasks like humans! They practice a lot to become smarter. 🌟",
-        "explanation_5": "AI is when computers learn from data and make decisions like people! They use lots of examples to improve over time. 🚀",
-        "explanation_6": "Artificial Intelligence helps computers learn from data, recognize patterns, and think like humans! They get better by practicing with lots of examples. 💡",
-        "application_3": "AI helps your phone unlock when it sees your face in Lahore! 😄",
-        "application_4": "AI makes video games in Pakistan smarter with fun computer players! 🎮",
-        "application_5": "AI powers voice assistants like Siri to help you in Karachi! 🔊",
-        "application_6": "AI helps doctors in Islamabad find diseases in X-rays fast! 🩺"
-    },
-    {
-        "concept": "Machine Learning",
-        "explanation_3": "Machine learning is like teaching your pet new tricks with treats! The computer learns by trying again and again. 🐶",
-        "explanation_4": "Machine learning helps computers learn from examples, like how you practice writing! They get better with lots of practice. 📚",
-        "explanation_5": "Machine learning lets computers improve by learning from data! They find patterns and get smarter with more examples. 🤖",
-        "explanation_6": "Machine learning allows computers to find patterns in data and get better over time! It’s like training them with thousands of examples. 🌐",
-        "application_3": "Apps suggest fun videos for you to watch in Islamabad! 📺",
-        "application_4": "Machine learning guesses what you type next on your phone in Peshawar! ⌨️",
-        "application_5": "It helps email apps filter out spam messages for you in Lahore! 📧",
-        "application_6": "Banks in Karachi use it to spot fake transactions quickly! 💳"
-    },
-    {
-        "concept": "Robotics",
-        "explanation_3": "Robotics is making robots that move with AI! They learn to do jobs like cleaning your room. 🤖",
-        "explanation_4": "Robotics uses AI to help robots do tasks like cleaning! They follow instructions to work smartly. 🧹",
-        "explanation_5": "Robotics combines AI to make robots work smartly! They can even help with homework tasks. 🚗",
-        "explanation_6": "Robotics uses AI to control robots for complex jobs! They learn to move and think like helpers in factories. 🏭",
-        "application_3": "Robots clean your house with AI in Multan! 🏠",
-        "application_4": "Robots help make toys in Pakistani factories with AI! 🧸",
-        "application_5": "Robots deliver packages using AI in Karachi! 📦",
-        "application_6": "Robots assist in surgeries with precision in Islamabad! 🏥"
-    },
-    {
-        "concept": "Voice Assistants",
-        "explanation_3": "Voice assistants are like talking friends with AI! They listen and help you with fun tasks. 🎤",
-        "explanation_4": "Voice assistants use AI to understand what you say! They learn your voice to assist you better. 🔊",
-        "explanation_5": "Voice assistants learn your voice with AI! They can set reminders or play music for you. 📱",
-        "explanation_6": "Voice assistants use AI to process and respond to speech! They get smarter by hearing you talk. 🌐",
-        "application_3": "Siri helps you call friends in your village! 📞",
-        "application_4": "Alexa plays music when you ask in Lahore! 🎵",
-        "application_5": "Google Assistant sets reminders for school in Peshawar! ⏰",
-        "application_6": "Voice assistants control smart lights in Karachi homes! 🏡"
-    },
-    {
-        "concept": "Image Recognition",
-        "explanation_3": "Image recognition lets AI see pictures like you! It can find your face in photos. 📸",
-        "explanation_4": "Image recognition helps AI find faces in photos! It learns by looking at lots of pictures. 😊",
-        "explanation_5": "Image recognition uses AI to spot objects! It studies images to know what’s in them. 🔍",
-        "explanation_6": "Image recognition enables AI to identify and classify visuals! It trains on data to recognize things accurately. 🌄",
-        "application_3": "AI finds your face in family photos in Multan! 🖼️",
-        "application_4": "Cameras use it to tag friends in Lahore pics! 📷",
-        "application_5": "It helps find lost pets in pictures in Karachi! 🐱",
-        "application_6": "AI checks security cameras for safety in Islamabad! 🔐"
-    },
-    {
-        "concept": "Self-Driving Cars",
-        "explanation_3": "Self-driving cars use AI to drive alone! They learn roads like a smart driver. 🚗",
-        "explanation_4": "Self-driving cars learn roads with AI! They use cameras to drive safely. 🛤️",
-        "explanation_5": "Self-driving cars use AI to avoid accidents! They watch the road and make smart moves. 🚦",
-        "explanation_6": "Self-driving cars rely on AI for navigation and safety! They analyze data to drive on busy streets. 🌍",
-        "application_3": "Future cars drive you to school in Lahore! 🎒",
-        "application_4": "They help deliver food without drivers in Karachi! 🍕",
-        "application_5": "Trucks use them for long trips in Punjab! 🚛",
-        "application_6": "They reduce accidents on busy roads in Islamabad! 🛡️"
-    },
-    {
-        "concept": "Chatbots",
-        "explanation_3": "Chatbots are AI friends that talk to you! They answer questions with fun replies. 💬",
-        "explanation_4": "Chatbots use AI to answer your questions! They learn to chat like a friend. 🤗",
-        "explanation_5": "Chatbots learn to chat with AI! They help you with tasks like ordering food. 📱",
-        "explanation_6": "Chatbots use AI to simulate human conversation! They improve by talking to many people. 🌐",
-        "application_3": "Chatbots help you order biryani online in Multan! 🍔",
-        "application_4": "They answer questions on websites in Lahore! 🌐",
-        "application_5": "Chatbots assist customer service in Karachi! 📞",
-        "application_6": "They provide 24/7 support for shops in Peshawar! ⏳"
-    },
-    {
-        "concept": "Game AI",
-        "explanation_3": "Game AI makes computer players smart! They learn to play with you. 🎮",
-        "explanation_4": "Game AI helps games challenge you! It practices to be a tough opponent. 🕹️",
-        "explanation_5": "Game AI learns to play better with time! It studies your moves to improve. 🎲",
-        "explanation_6": "Game AI uses algorithms to create dynamic opponents! They adapt to make games exciting. 🌟",
-        "application_3": "AI makes your cricket game more fun in Karachi! 🎉",
-        "application_4": "It creates tough enemies in video games in Lahore! 👾",
-        "application_5": "AI helps design puzzle games in Islamabad! 🧩",
-        "application_6": "It powers AI teammates in multiplayer games in Peshawar! 👥"
-    },
-    {
-        "concept": "Natural Language Processing",
-        "explanation_3": "This is AI that understands words! It listens to you like a friend. 📝",
-        "explanation_4": "Natural language processing makes AI read text! It learns to understand sentences. 📖",
-        "explanation_5": "It helps AI understand and write sentences! It practices with lots of words. ✍️",
-        "explanation_6": "Natural language processing enables AI to interpret and generate human language! It trains on text to communicate better. 🌐",
-        "application_3": "AI translates your Urdu to English in Multan! 🌍",
-        "application_4": "It helps apps correct your spelling in Lahore! 📝",
-        "application_5": "AI writes stories with this in Karachi! 📚",
-        "application_6": "It powers language learning apps in Islamabad! 🗣️"
-    },
-    {
-        "concept": "AI in Healthcare",
-        "explanation_3": "AI helps doctors like a super helper! It finds sickness fast. 🩺",
-        "explanation_4": "AI in healthcare finds sick people fast! It looks at pictures to help doctors. ⚕️",
-        "explanation_5": "AI analyzes data to help doctors! It learns to spot problems in patients. 📊",
-        "explanation_6": "AI improves diagnostics and treatment plans in healthcare! It uses data to assist doctors better. 💉",
-        "application_3": "AI finds colds in pictures in Lahore! 🤒",
-        "application_4": "It helps doctors with checkups in Karachi! 🩻",
-        "application_5": "AI predicts hospital needs in Islamabad! 🏥",
-        "application_6": "It assists in robotic surgeries in Peshawar! 🤖"
-    },
-    {
-        "concept": "Smart Homes",
-        "explanation_3": "Smart homes use AI to help at home! They turn lights on for you. 🏠",
-        "explanation_4": "AI turns lights on with smart homes! It learns your habits to save energy. 💡",
-        "explanation_5": "Smart homes use AI to save energy! They adjust things like fans for you. 🌱",
-        "explanation_6": "Smart homes leverage AI for automation and efficiency! They learn to manage power smartly. ⚙️",
-        "application_3": "AI locks your door safely in Multan! 🔒",
-        "application_4": "It turns off lights when you sleep in Lahore! 🌙",
-        "application_5": "AI adjusts your room temperature in Karachi! ❄️",
-        "application_6": "It manages energy bills smartly in Islamabad! 💸"
-    },
-    {
-        "concept": "Predictive AI",
-        "explanation_3": "Predictive AI guesses what happens next! It’s like a magic helper. 🔮",
-        "explanation_4": "It predicts weather with AI! It looks at data to tell you if it’ll rain. ☀️",
-        "explanation_5": "Predictive AI forecasts trends! It uses past data to guess the future. 📈",
-        "explanation_6": "Predictive AI analyzes data to forecast future events! It helps plan based on patterns. 🌐",
-        "application_3": "AI tells if it will rain in Lahore! 🌧️",
-        "application_4": "It predicts your favorite shows in Karachi! 📺",
-        "application_5": "AI forecasts school holidays in Islamabad! 🎉",
-        "application_6": "It helps plan traffic in Peshawar! 🚦"
-    },
-]
+# Each session walks through the concepts in its own shuffled order, made the
+# first time it opens AI mode.
 
-# Move shuffle to app initialization for performance
-random.shuffle(AI_CONCEPTS)
-ai_state = {"index": 0, "active": False}
+def current_concept(ai_state):
+    concepts = get_concepts()
+    if ai_state["order"] is None:
+        ai_state["order"] = concepts.shuffled_order()
+    return concepts[ai_state["order"][ai_state["index"]]]
 
 def get_explanation_and_application(concept, grade):
-    start_time = time.time()
-    grade_num = int(grade) if grade and grade.isdigit() else 3
-    if grade_num <= 3:
-        result = concept["explanation_3"], concept["application_3"]
-    elif grade_num == 4:
-        result = concept["explanation_4"], concept["application_4"]
-    elif grade_num == 5:
-        result = concept["explanation_5"], concept["application_5"]
-    else:
-        result = concept["explanation_6"], concept["application_6"]
-    logging.debug(f"get_explanation_and_application took {time.time() - start_time} seconds")
-    return result
+    slot = get_concepts().grade_slot(grade)
+    return concept.explanations[slot], concept.applications[slot]
+
+def format_concept(concept, explanation):
+    return f"**{concept.name}**\n\n{explanation}"
+
+# --- Screen rendering ---
+# A grade or subject change redraws the whole screen in one round trip, from
+# one function of (grade, subject, session). Handlers build {name: update}
+# dicts and return them as tuples in the order of an *_OUTPUTS list; the
+# event wiring maps the same names to components.
+
+MIC_INSTRUCTIONS = "### 🗣️ Prefer speaking? Tap the mic below and ask your question out loud!"
+AI_MIC_INSTRUCTIONS = "### 🗣️ In AI mode, use 'Listen' to hear concepts or 'Real-Life Application' for examples!"
+QUESTION_PLACEHOLDER = "❓ Ask your question here (in English or Roman Urdu), then press Enter!"
+SELECT_FIRST_PLACEHOLDER = "🎯 Please select your grade and subject first to enable the Ask Now! button."
+AI_PLACEHOLDER = "🤖 You're in AI Learning Mode! Use the buttons on the right to explore AI concepts."
+AI_HEADER = "#### 🚀 Welcome to <span style='color:#007bff'><b>AI Learning Mode</b></span><br>_Let's explore AI concepts together, one exciting step at a time!_"
+# Static markup, styled by the .avatar rule in the page CSS
+IDLE_AVATAR = "<div class='avatar' role='img' aria-label='Chatbot avatar'>🤖</div>"
+THINKING_AVATAR = "<div class='avatar' role='img' aria-label='Chatbot avatar'>🤖💭</div>"
+
+SCREEN_OUTPUTS = [
+    "ai_header", "ai_progress", "response_output", "fun_fact_output", "fun_fact_btn", "real_life_app_btn",
+    "next_concept_btn", "btn_ai_exit", "question_input", "ask_btn", "audio_input", "mic_instructions",
+    "next_instruction", "speak_btn", "audio_box", "speak_funfact_btn", "audio_funfact_box", "clear_output_btn"
+]
+# Clear and Exit AI Mode also reset the recording, the avatar and (on exit) the subject
+RESET_OUTPUTS = SCREEN_OUTPUTS + ["avatar", "subject"]
+CHAT_OUTPUTS = ["response_output", "fun_fact_btn", "avatar", "next_instruction", "clear_output_btn", "speak_btn", "audio_box"]
+FUN_FACT_OUTPUTS = ["fun_fact_output", "speak_funfact_btn", "next_instruction", "clear_output_btn", "audio_funfact_box"]
+NEXT_CONCEPT_OUTPUTS = [
+    "ai_progress", "response_output", "fun_fact_output", "real_life_app_btn", "next_concept_btn", "btn_ai_exit",
+    "speak_btn", "speak_funfact_btn", "next_instruction", "audio_box", "audio_funfact_box", "clear_output_btn"
+]
 
-def start_ai_mode(grade):
-    start_time = time.time()
-    logging.debug(f"Grade value in start_ai_mode: {grade}")
-    if not grade or grade == "Select Grade":
-        logging.debug(f"start_ai_mode took {time.time() - start_time} seconds")
-        return (
-            gr.update(value="🎯 Please select a grade first!", visible=True),
-            gr.update(value="", visible=False),
-            gr.update(value="", visible=True),
-            gr.update(value="", visible=False),
-            gr.update(visible=False),
-            gr.update(visible=False),
-            gr.update(visible=False),
-            gr.update(visible=False),
-            gr.update(visible=True),
-            gr.update(visible=True),
-            gr.update(visible=True),
-            gr.update(value="### 🗣️ Prefer speaking? Tap the mic below and ask your question out loud!", visible=True),
-            gr.update(label="💡 Real-Life Application", value="", visible=False),
-            gr.update(value="", visible=False),
-            gr.update(visible=False),  # speak_btn
-            gr.update(visible=False),  # audio_out
-            gr.update(visible=False)   # clear_output_btn
-        )
-    ai_state["index"] = 0
-    ai_state["active"] = True
-    concept = AI_CONCEPTS[ai_state["index"]]
-    logging.debug(f"Fetching concept: {concept}")
-    explanation, _ = get_explanation_and_application(concept, grade)
-    progress = f"**🧩 Concept <span style='color:#28a745'><b>{ai_state['index']+1}</b></span> of <span style='color:#28a745'><b>{len(AI_CONCEPTS)}</b></span>**"
-    header = "#### 🚀 Welcome to <span style='color:#007bff'><b>AI Learning Mode</b></span><br>_Let's explore AI concepts together, one exciting step at a time!_"
-    logging.debug("Entering AI mode: Setting buttons to visible, including speak_btn")
-    logging.debug(f"start_ai_mode took {time.time() - start_time} seconds")
-    return (
-        gr.update(value=header, visible=True),
-        gr.update(value=progress, visible=True),
-        gr.update(value=f"**{concept['concept']}**\n\n{explanation}", visible=True),
-        gr.update(value="", visible=False),  # fun_fact_output
-        gr.update(visible=True),  # real_life_app_btn
-        gr.update(visible=True),  # next_concept_btn
-        gr.update(visible=True),  # btn_ai_exit
-        gr.update(visible=False),  # fun_fact_btn
-        gr.update(visible=False),  # question_input
-        gr.update(visible=False),  # ask_btn
-        gr.update(visible=False),  # audio_input
-        gr.update(value="### 🗣️ In AI mode, use 'Listen' to hear concepts or 'Real-Life Application' for examples!", visible=True),  # mic_instructions
-        gr.update(label="💡 Real-Life Application", value="", visible=False),  # fun_fact_output
-        gr.update(value="", visible=False),  # next_instruction
-        gr.update(visible=True),  # speak_btn
-        gr.update(visible=False),  # audio_out
-        gr.update(visible=False)   # clear_output_btn
-    )
+def as_outputs(updates, names):
+    return tuple(updates.get(name, gr.update()) for name in names)
 
-def next_ai_concept(grade):
-    start_time = time.time()
+def render_concept(grade, ai_state):
+    concept = current_concept(ai_state)
+    explanation, _ = get_explanation_and_application(concept, grade)
+    progress = f"**🧩 Concept <span style='color:#28a745'><b>{ai_state['index']+1}</b></span> of <span style='color:#28a745'><b>{len(ai_state['order'])}</b></span>**"
+    return {
+        "ai_progress": gr.update(value=progress, visible=True),
+        "response_output": gr.update(value=format_concept(concept, explanation), visible=True),
+        "fun_fact_output": gr.update(label="💡 Real-Life Application", value="", visible=False),
+        "real_life_app_btn": gr.update(visible=True),
+        "next_concept_btn": gr.update(visible=True),
+        "btn_ai_exit": gr.update(visible=True),
+        "speak_btn": gr.update(visible=True),
+        "speak_funfact_btn": gr.update(visible=False),
+        "next_instruction": gr.update(value="", visible=False),
+        "audio_box": gr.update(visible=False),
+        "audio_funfact_box": gr.update(visible=False),
+        "clear_output_btn": gr.update(visible=False)
+    }
+
+def render_screen(grade, subject, session):
+    grade_valid = bool(grade) and grade != "Select Grade"
+    screen = {
+        "ai_header": gr.update(value="", visible=False),
+        "ai_progress": gr.update(value="", visible=False),
+        "response_output": gr.update(value="", visible=True),
+        "fun_fact_output": gr.update(label="💡 Fun Fact or Real-Life Example", value="", visible=False),
+        "fun_fact_btn": gr.update(value="🎈 Show Me a Fun Fact!", visible=False),
+        "real_life_app_btn": gr.update(visible=False),
+        "next_concept_btn": gr.update(visible=False),
+        "btn_ai_exit": gr.update(visible=False),
+        "question_input": gr.update(value="", interactive=False, placeholder=SELECT_FIRST_PLACEHOLDER, visible=True),
+        "ask_btn": gr.update(interactive=False, visible=True),
+        "audio_input": gr.update(visible=True),
+        "mic_instructions": gr.update(value=MIC_INSTRUCTIONS, visible=True),
+        "next_instruction": gr.update(value="", visible=False),
+        "speak_btn": gr.update(visible=False),
+        "audio_box": gr.update(visible=False),
+        "speak_funfact_btn": gr.update(visible=False),
+        "audio_funfact_box": gr.update(visible=False),
+        "clear_output_btn": gr.update(visible=False)
+    }
+    if subject == "Learn AI" and not grade_valid:
+        screen["ai_header"] = gr.update(value="🎯 Please select a grade first!", visible=True)
+        screen["fun_fact_output"] = gr.update(label="💡 Real-Life Application", value="", visible=False)
+    elif subject == "Learn AI":
+        screen.update(render_concept(grade, session["ai_state"]))
+        screen.update({
+            "ai_header": gr.update(value=AI_HEADER, visible=True),
+            "question_input": gr.update(value="", interactive=False, placeholder=AI_PLACEHOLDER, visible=False),
+            "ask_btn": gr.update(interactive=False, visible=False),
+            "audio_input": gr.update(visible=False),
+            "mic_instructions": gr.update(value=AI_MIC_INSTRUCTIONS, visible=True)
+        })
+    elif grade_valid and subject:
+        screen["question_input"] = gr.update(value="", interactive=True, placeholder=QUESTION_PLACEHOLDER, visible=True)
+        screen["ask_btn"] = gr.update(interactive=True, visible=True)
+    return screen
+
+def reset_session(session, subject):
+    # The session keeps its concept order, so coming back to AI mode starts from the same first concept
+    session["ai_state"] = {"index": 0, "order": session["ai_state"]["order"], "active": subject == "Learn AI"}
+    session["subject"] = subject
+    session["question"] = ""
+    session["cache_key"] = None
+    session["fun_fact_topic"] = None
+    cancel_prefetch(session)
+    # A new grade or subject starts a new conversation
+    session["conversation_history"].clear()
+
+@metrics.timed("on_selection_change")
+def on_selection_change(grade, subject, request: gr.Request):
+    session = get_session(request)
+    reset_session(session, subject)
+    return as_outputs(render_screen(grade, subject, session), SCREEN_OUTPUTS)
+
+@metrics.timed("next_ai_concept")
+def next_ai_concept(grade, request: gr.Request):
+    ai_state = get_session(request)["ai_state"]
     ai_state["index"] += 1
-    if ai_state["index"] >= len(AI_CONCEPTS):
+    if ai_state["index"] >= len(get_concepts()):
         ai_state["index"] = 0
-    concept = AI_CONCEPTS[ai_state["index"]]
-    logging.debug(f"Fetching concept: {concept}")
-    explanation, _ = get_explanation_and_application(concept, grade)
-    progress = f"**🧩 Concept <span style='color:#28a745'><b>{ai_state['index']+1}</b></span> of <span style='color:#28a745'><b>{len(AI_CONCEPTS)}</b></span>**"
-    logging.debug("Next concept: Keeping buttons visible, including speak_btn")
-    logging.debug(f"next_ai_concept took {time.time() - start_time} seconds")
-    return (
-        gr.update(value=progress, visible=True),
-        gr.update(value=f"**{concept['concept']}**\n\n{explanation}", visible=True),
-        gr.update(value="", visible=False),  # fun_fact_output
-        gr.update(visible=True),  # real_life_app_btn
-        gr.update(visible=True),  # next_concept_btn
-        gr.update(visible=True),  # btn_ai_exit
-        gr.update(visible=True),  # speak_btn
-        gr.update(visible=False),  # speak_funfact_btn
-        gr.update(value="", visible=False),  # next_instruction
-        gr.update(visible=False),  # audio_out
-        gr.update(visible=False)   # clear_output_btn
-    )
+    return as_outputs(render_concept(grade, ai_state), NEXT_CONCEPT_OUTPUTS)
 
-def show_real_life_application(grade):
-    start_time = time.time()
-    concept = AI_CONCEPTS[ai_state["index"]]
-    _, application = get_explanation_and_application(concept, grade)
-    logging.debug("Showing real-life application: Buttons should remain visible")
-    logging.debug(f"show_real_life_application took {time.time() - start_time} seconds")
+@metrics.timed("show_real_life_application")
+def show_real_life_application(grade, request: gr.Request):
+    ai_state = get_session(request)["ai_state"]
+    _, application = get_explanation_and_application(current_concept(ai_state), grade)
     return (
         gr.update(value=application, visible=True),
-        gr.update(visible=True),
+        gr.update(visible=True),  # speak_funfact_btn
         gr.update(value="", visible=False),  # next_instruction
-        gr.update(visible=False)  # clear_output_btn
+        gr.update(visible=False),  # clear_output_btn
+        gr.update(visible=False)  # audio_funfact_box
     )
 
-def exit_ai_mode(grade, subject):
-    start_time = time.time()
-    ai_state["index"] = 0
-    ai_state["active"] = False
-    global_state["question"] = ""
-    global_state["conversation_history"] = []
-    global_state["topic_cache"] = {}
-    global_state["fun_fact_cache"] = {}
-    new_subject = "Math"
-    global_state["subject"] = new_subject
-    logging.debug("Exiting AI mode: Resetting UI, switching subject to Math and updating input state")
-    reset_outputs = (
-        "",  # response_output
-        "",  # fun_fact_output
-        gr.update(value="", interactive=False, placeholder="🎯 Please select your grade and subject first to enable the Ask Now! button.", visible=True),  # question_input
-        None,  # audio_input reset
-        gr.update(value="🎈 Show Me a Fun Fact!", visible=False),  # fun_fact_btn
-        gr.update(interactive=False),  # ask_btn
-        "<div style='font-size: 5em; text-align: center;'>🤖</div>",  # avatar
-        grade,  # grade (retain current value)
-        new_subject,  # switch subject to Math
-        gr.update(visible=False),  # speak_btn
-        gr.update(visible=False),  # audio_out
-        gr.update(visible=False),  # speak_funfact_btn
-        gr.update(visible=False),  # audio_funfact_out
-        gr.update(visible=False),  # real_life_app_btn
-        gr.update(visible=False),  # next_concept_btn
-        gr.update(visible=False),  # btn_ai_exit
-        gr.update(visible=False),  # ai_header
-        gr.update(visible=False),  # ai_progress
-        gr.update(value="### 🗣️ Prefer speaking? Tap the mic below and ask your question out loud!", visible=True),  # mic_instructions
-        gr.update(label="💡 Fun Fact or Real-Life Example", value="", visible=False),  # fun_fact_output
-        gr.update(value="", visible=False),  # next_instruction
-        gr.update(visible=False)   # clear_output_btn
-    )
-    input_state = update_input_state(grade, new_subject)
-    logging.debug(f"exit_ai_mode took {time.time() - start_time} seconds")
-    return reset_outputs + input_state
+def render_reset(grade, subject, session):
+    screen = render_screen(grade, subject, session)
+    screen["audio_input"]["value"] = None
+    screen["avatar"] = IDLE_AVATAR
+    return screen
 
-def on_subject_change(subject, grade):
-    start_time = time.time()
-    logging.debug(f"Subject changed to {subject}, Grade: {grade}")
-    ai_state["index"] = 0
-    ai_state["active"] = False
-    if subject == "Learn AI":
-        if not grade or grade == "Select Grade":
-            logging.debug(f"on_subject_change took {time.time() - start_time} seconds")
-            return (
-                gr.update(value="🎯 Please select a grade first!", visible=True),
-                gr.update(value="", visible=False),
-                gr.update(value="", visible=True),
-                gr.update(value="", visible=False),
-                gr.update(visible=False),
-                gr.update(visible=False),
-                gr.update(visible=False),
-                gr.update(visible=False),
-                gr.update(visible=True),
-                gr.update(visible=True),
-                gr.update(visible=True),
-                gr.update(value="### 🗣️ Prefer speaking? Tap the mic below and ask your question out loud!", visible=True),
-                gr.update(label="💡 Real-Life Application", value="", visible=False),
-                gr.update(value="", visible=False),
-                gr.update(visible=False),  # speak_btn
-                gr.update(visible=False),  # audio_out
-                gr.update(visible=False)   # clear_output_btn
-            )
-        return start_ai_mode(grade)
-    else:
-        logging.debug("Switching to normal mode: Restoring question input and buttons")
-        placeholder = "❓ Ask your question here (in English or Roman Urdu), then press Enter!"
-        interactive = grade and grade != "Select Grade"
-        logging.debug(f"on_subject_change took {time.time() - start_time} seconds")
-        return (
-            gr.update(value="", visible=False),  # ai_header
-            gr.update(value="", visible=False),  # ai_progress
-            gr.update(value="", visible=True),  # response_output
-            gr.update(value="", visible=False),  # fun_fact_output
-            gr.update(visible=False),  # real_life_app_btn
-            gr.update(visible=False),  # next_concept_btn
-            gr.update(visible=False),  # btn_ai_exit
-            gr.update(visible=False),  # fun_fact_btn
-            gr.update(value="", interactive=interactive, placeholder=placeholder),  # question_input
-            gr.update(interactive=interactive),  # ask_btn
-            gr.update(visible=True),  # audio_input
-            gr.update(value="### 🗣️ Prefer speaking? Tap the mic below and ask your question out loud!", visible=True),  # mic_instructions
-            gr.update(label="💡 Fun Fact or Real-Life Example", value="", visible=False),  # fun_fact_output
-            gr.update(value="", visible=False),  # next_instruction
-            gr.update(visible=False),  # speak_btn
-            gr.update(visible=False),  # audio_out
-            gr.update(visible=False)   # clear_output_btn
-        )
-
-def on_grade_change(grade, subject):
-    start_time = time.time()
-    logging.debug(f"Grade changed to {grade}, Subject: {subject}")
-    if subject == "Learn AI":
-        if not grade or grade == "Select Grade":
-            logging.debug(f"on_grade_change took {time.time() - start_time} seconds")
-            return (
-                gr.update(value="🎯 Please select a grade first!", visible=True),
-                gr.update(value="", visible=False),
-                gr.update(value="", visible=True),
-                gr.update(value="", visible=False),
-                gr.update(visible=False),
-                gr.update(visible=False),
-                gr.update(visible=False),
-                gr.update(visible=False),
-                gr.update(visible=True),
-                gr.update(visible=True),
-                gr.update(visible=True),
-                gr.update(value="### 🗣️ Prefer speaking? Tap the mic below and ask your question out loud!", visible=True),
-                gr.update(label="💡 Real-Life Application", value="", visible=False),
-                gr.update(value="", visible=False),
-                gr.update(visible=False),  # speak_btn
-                gr.update(visible=False),  # audio_out
-                gr.update(visible=False)   # clear_output_btn
-            )
-        return start_ai_mode(grade)
-    else:
-        placeholder = "❓ Ask your question here (in English or Roman Urdu), then press Enter!"
-        interactive = grade and grade != "Select Grade" and subject and subject != "Learn AI"
-        logging.debug(f"on_grade_change took {time.time() - start_time} seconds")
-        return (
-            gr.update(visible=False),  # ai_header
-            gr.update(visible=False),  # ai_progress
-            gr.update(value="", visible=True),  # response_output
-            gr.update(value="", visible=False),  # fun_fact_output
-            gr.update(visible=False),  # real_life_app_btn
-            gr.update(visible=False),  # next_concept_btn
-            gr.update(visible=False),  # btn_ai_exit
-            gr.update(visible=False),  # fun_fact_btn
-            gr.update(value="", interactive=interactive, placeholder=placeholder),  # question_input
-            gr.update(interactive=interactive),  # ask_btn
-            gr.update(visible=True),  # audio_input
-            gr.update(value="### 🗣️ Prefer speaking? Tap the mic below and ask your question out loud!", visible=True),  # mic_instructions
-            gr.update(label="💡 Fun Fact or Real-Life Example", value="", visible=False),  # fun_fact_output
-            gr.update(value="", visible=False),  # next_instruction
-            gr.update(visible=False),  # speak_btn
-            gr.update(visible=False),  # audio_out
-            gr.update(visible=False)   # clear_output_btn
-        )
+@metrics.timed("exit_ai_mode")
+def exit_ai_mode(grade, request: gr.Request):
+    session = get_session(request)
+    reset_session(session, "Math")
+    screen = render_reset(grade, "Math", session)
+    screen["subject"] = "Math"
+    return as_outputs(screen, RESET_OUTPUTS)
 
 # --- Normal Q&A Chatbot Logic ---
 encouragement_phrases = [
@@ -414,313 +321,391 @@ encouragement_phrases = [
     "Wow, that's smart! 👏"
 ]
 
-global_state = {
-    "grade": None,
-    "subject": None,
-    "question": "",
-    "conversation_history": [],
-    "topic_cache": {},
-    "fun_fact_cache": {}
-}
-
-urdu_indicators = [
-    'kya', 'kaise', 'kyun', 'hain', 'nahi', 'batao', 'karna', 'ka', 'ke', 'mein', 'ho', 'toh', 'yeh', 'woh',
-    'hai', 'tha', 'thi', 'hain', 'tum', 'mera', 'apna', 'apne', 'kuch', 'sab', 'koi', 'kab', 'kaun'
-]
-
-def is_roman_urdu(text):
-    start_time = time.time()
-    if not text or not isinstance(text, str):
-        logging.debug(f"is_roman_urdu took {time.time() - start_time} seconds")
-        return False
-    text = text.lower()
-    count = sum(word in text for word in urdu_indicators)
-    logging.debug(f"Roman Urdu detection for '{text}': {count} matches")
-    logging.debug(f"is_roman_urdu took {time.time() - start_time} seconds")
-    return count >= 2
-
-def clean_latex(text):
-    start_time = time.time()
-    text = re.sub(r'\\\((.*?)\\\)', r'\1', text)
-    text = re.sub(r'\\\[(.*?)\\\]', r'\1', text)
-    text = re.sub(r'\${1,2}(.*?)\${1,2}', r'\1', text)
-    text = text.replace("\\", "")
-    logging.debug(f"clean_latex took {time.time() - start_time} seconds")
-    return text
-
 def validate_inputs(grade, subject, question):
-    start_time = time.time()
     if not grade or grade == "Select Grade":
-        logging.debug(f"validate_inputs took {time.time() - start_time} seconds")
         return "🎯 Please select a grade first!"
     if not subject or subject == "Learn AI":
-        logging.debug(f"validate_inputs took {time.time() - start_time} seconds")
         return "🎯 Please select your subject!"
     if not question or len(question.strip()) < 3:
-        logging.debug(f"validate_inputs took {time.time() - start_time} seconds")
         return "❗ Please enter a question with at least 3 characters!"
-    logging.debug(f"validate_inputs took {time.time() - start_time} seconds")
     return ""
 
-def generate_fun_fact(subject, grade, question, language):
-    start_time = time.time()
-    if question in global_state["fun_fact_cache"]:
-        logging.debug(f"generate_fun_fact took {time.time() - start_time} seconds")
-        return global_state["fun_fact_cache"][question]
+def build_fun_fact_prompt(subject, grade, question, language, topic=None):
     lang_prefix = "in Roman Urdu" if language == "urdu" else "in English"
-    prompt = (
+    # A follow-up ("tell me more about it") means nothing alone, so name what it is about
+    about = f"Topic: '{topic}'. Follow-up question: '{question}'." if topic else f"Question: '{question}'."
+    return (
         f"Give a fun, short fact or real-life connection related to this question, "
-        f"without repeating the original answer. Question: '{question}'. "
+        f"without repeating the original answer. {about} "
         f"Make it easy and engaging for a Grade {grade} student in Pakistan studying {subject}. "
         f"Answer strictly {lang_prefix}. Do not mix languages."
     )
-    try:
-        response = client.chat.completions.create(
+
+# Identical questions asked at the same time share one model call
+answer_flights = singleflight.SingleFlight("answer")
+fun_fact_flights = singleflight.SingleFlight("fun_fact")
+
+async def fetch_fun_fact(subject, grade, question, language, cache_key, topic=None):
+    prompt = build_fun_fact_prompt(subject, grade, question, language, topic)
+    with metrics.timer("openai_request_seconds", call="fun_fact"):
+        response = await get_client().chat.completions.create(
             model=MODEL,
             messages=[{"role": "user", "content": prompt}],
             temperature=0.7,
             max_tokens=100  # Reduced for faster response
         )
-        fact = clean_latex(response.choices[0].message.content.strip())
-        global_state["fun_fact_cache"][question] = fact
-        logging.debug(f"generate_fun_fact took {time.time() - start_time} seconds")
-        return fact
+    metrics.record_usage("fun_fact", response.usage)
+    fact = clean_latex(response.choices[0].message.content.strip())
+    if cache_key is not None:
+        fun_fact_cache.set(cache_key, fact)
+    return fact
+
+@metrics.timed("generate_fun_fact")
+async def generate_fun_fact(subject, grade, question, language, cache_key, topic=None):
+    # Follow-ups have no cache key: their facts depend on the chat, so they are never shared
+    cached = fun_fact_cache.get(cache_key) if cache_key is not None else None
+    if cached is not None:
+        return cached
+    try:
+        return await fun_fact_flights.run(
+            cache_key, lambda: fetch_fun_fact(subject, grade, question, language, cache_key, topic)
+        )
     except Exception as e:
         logging.error(f"Error generating fun fact: {e}")
-        logging.debug(f"generate_fun_fact took {time.time() - start_time} seconds")
         return "Oops! Couldn't fetch a fun fact right now. Please try again later."
 
-def extract_topic(answer, question):
-    start_time = time.time()
-    if question in global_state["topic_cache"]:
-        logging.debug(f"extract_topic took {time.time() - start_time} seconds")
-        return global_state["topic_cache"][question]
-    try:
-        extract_prompt = f"Extract the main topic (1 to 3 words) from the following explanation:\n'{answer}'"
-        topic_response = client.chat.completions.create(
-            model=MODEL,
-            messages=[{"role": "user", "content": extract_prompt}],
-            temperature=0.5,
-            max_tokens=10
-        )
-        topic = topic_response.choices[0].message.content.strip().capitalize()
-        global_state["topic_cache"][question] = topic
-        logging.debug(f"extract_topic took {time.time() - start_time} seconds")
-        return topic
-    except Exception as e:
-        logging.error(f"Error extracting topic: {e}")
-        logging.debug(f"extract_topic took {time.time() - start_time} seconds")
-        return None
+# Fun facts are generated in the background while the answer streams, so the
+# fun-fact button is usually served straight from the cache.
+PREFETCH_FUN_FACTS = os.environ.get("PREFETCH_FUN_FACTS", "1") == "1"
+
+def start_fun_fact_prefetch(session):
+    cancel_prefetch(session)
+    if PREFETCH_FUN_FACTS:
+        session["prefetch_task"] = asyncio.create_task(generate_fun_fact(
+            session["subject"], session["grade"], session["question"], session["language"], session["cache_key"],
+            session["fun_fact_topic"]
+        ))
+
+def cancel_prefetch(session):
+    task = session.get("prefetch_task")
+    session["prefetch_task"] = None
+    if task is not None and not task.done():
+        # Handlers may run in Gradio's worker threads, so cancel on the task's own loop
+        task.get_loop().call_soon_threadsafe(task.cancel)
+
+# The model ends every answer with a "TOPIC: ..." line, so the fun-fact button
+# label comes out of the same completion instead of a second API call. The
+# marker only counts at the start of a line, so "Today's topic: fractions!" stays
+# part of the answer; any case and markdown bold ("**Topic:** Gravity") are
+# accepted. Streaming and the final parse cut at the same place.
+TOPIC_MARKER = "TOPIC:"
+_topic_line_re = re.compile(r"^[ \t]*\**[ \t]*topic[ \t]*\**[ \t]*:\**", re.IGNORECASE | re.MULTILINE)
+
+def strip_topic_trailer(text):
+    match = _topic_line_re.search(text)
+    if match:
+        return text[:match.start()]
+    # Hold back a marker that is still arriving on the last line, e.g. "...fun!\n**Top"
+    line_start = text.rfind("\n") + 1
+    last_line = text[line_start:]
+    if last_line and TOPIC_MARKER.lower().startswith(last_line.replace("*", "").replace(" ", "").lower()):
+        return text[:line_start]
+    return text
 
-def avatar_update(thinking):
-    start_time = time.time()
-    style = """
-    font-size: 6em !important;
-    text-align: center !important;
-    margin: 0 auto !important;
-    display: flex !important;
-    justify-content: center !important;
-    align-items: center !important;
-    """
-    logging.debug(f"avatar_update took {time.time() - start_time} seconds")
-    return f"<div style='{style}' role='img' aria-label='Chatbot avatar'>🤖{'💭' if thinking else ''}</div>"
-
-def chatbot_response(grade, subject, question):
-    start_time = time.time()
-    validation_error = validate_inputs(grade, subject, question)
-    if validation_error:
-        logging.debug(f"chatbot_response took {time.time() - start_time} seconds")
-        return validation_error, gr.update(value="🎈 Show Me a Fun Fact!", visible=False), avatar_update(False), gr.update(value="", visible=False), gr.update(visible=False)
-    global_state.update({"grade": grade, "subject": subject, "question": question})
-    global_state["conversation_history"] = []
-    history = global_state.get("conversation_history", [])
-    history.append({"role": "user", "content": question})
-    global_state["conversation_history"] = history
-    subject_lower = subject.lower()
-    language = "urdu" if is_roman_urdu(question) else "english"
-    logging.debug(f"Detected language for question '{question}': {language}")
-    system_prompt = (
+def split_topic_trailer(text):
+    match = _topic_line_re.search(text)
+    if not match:
+        return text.strip(), None
+    answer = text[:match.start()].rstrip(" \n*")
+    topic = text[match.end():].split("\n", 1)[0].strip(" *.!\"'")
+    return answer, topic.capitalize() if topic else None
+
+# --- System prompts ---
+# One prompt per (grade, subject, language), built once at startup and carrying
+# only that grade's instructions instead of all four.
+
+GRADES = ["3", "4", "5", "6"]
+SUBJECTS = ["Math", "Science", "English"]
+LANGUAGES = ["english", "urdu"]
+
+GRADE_STYLES = {
+    "3": "Use VERY simple words, short sentences, and LOTS of emojis. Be playful and use exclamation marks!",
+    "4": "Use simple explanations, basic examples, and plenty of emojis and excitement.",
+    "5": "Give clear, slightly more detailed answers, but still keep it lively and positive.",
+    "6": "Give thoughtful, slightly advanced explanations, but keep the tone friendly and encouraging."
+}
+
+def build_system_prompt(grade, subject, language):
+    return (
         f"You are a super fun, energetic, and friendly AI tutor for Pakistani kids! "
-        f"For Grade 3: Use VERY simple words, short sentences, and LOTS of emojis. Be playful and use exclamation marks! "
-        f"For Grade 4: Use simple explanations, basic examples, and plenty of emojis and excitement. "
-        f"For Grade 5: Give clear, slightly more detailed answers, but still keep it lively and positive. "
-        f"For Grade 6: Give thoughtful, slightly advanced explanations, but keep the tone friendly and encouraging. "
-        f"You are currently talking to a Grade {grade} student studying {subject_lower}, so adjust accordingly. "
+        f"You are talking to a Grade {grade} student studying {subject.lower()}. "
+        f"{GRADE_STYLES.get(grade, GRADE_STYLES['3'])} "
         f"Always use fun language, exclamation marks, and at least 2-3 emojis per answer! "
-        f"Accept Roman Urdu or English. "
         f"Answer strictly {'in Roman Urdu' if language == 'urdu' else 'in English'}. Do not mix languages. "
         f"Do NOT use LaTeX or equations. Use plain language and numbers only. "
-        f"If the question is unclear, gently try to help anyway."
+        f"If the question is unclear, gently try to help anyway. "
+        f"After your answer, add one last line in the form '{TOPIC_MARKER} <main topic in 1 to 3 words>'."
     )
-    messages = [{"role": "system", "content": system_prompt}] + history
-    try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            temperature=0.7,
-            max_tokens=100  # Reduced for faster response
+
+SYSTEM_PROMPTS = {
+    (grade, subject, language): build_system_prompt(grade, subject, language)
+    for grade in GRADES for subject in SUBJECTS for language in LANGUAGES
+}
+
+def get_system_prompt(grade, subject, language):
+    prompt = SYSTEM_PROMPTS.get((grade, subject, language))
+    return prompt if prompt is not None else build_system_prompt(grade, subject, language)
+
+def thinking_updates():
+    # Built fresh on every call: gradio pops "value" out of the update dicts it is given
+    return (
+        "", gr.update(value="🎈 Show Me a Fun Fact!", visible=False), THINKING_AVATAR,
+        gr.update(value="", visible=False), gr.update(visible=False), gr.update(visible=False), gr.update(visible=False)
+    )
+
+# The same thinking screen, applied by the browser the moment Ask is pressed
+SHOW_THINKING_JS = f"() => {json.dumps(list(thinking_updates()))}"
+
+async def stream_answer(messages, cache_key=None, index_key=None, question=None):
+    # Runs once per distinct in-flight question, so the caches are written once
+    request_start = time.perf_counter()
+    stream = await get_client().chat.completions.create(
+        model=MODEL,
+        messages=messages,
+        temperature=0.7,
+        max_tokens=115,  # Short answer plus the topic line
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+    answer = ""
+    finish_reason = None
+    async for chunk in stream:
+        if chunk.usage is not None:
+            metrics.record_usage("answer", chunk.usage)
+        if not chunk.choices:
+            continue
+        finish_reason = chunk.choices[0].finish_reason or finish_reason
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+        if not answer:
+            metrics.observe("openai_first_token_seconds", time.perf_counter() - request_start, call="answer")
+        answer += delta
+        yield delta
+    metrics.observe("openai_request_seconds", time.perf_counter() - request_start, call="answer")
+    answer, topic = split_topic_trailer(answer)
+    if topic is None:
+        # The fun fact button falls back to its generic label
+        logging.warning(f"Answer has no {TOPIC_MARKER} line (finish reason: {finish_reason})")
+        metrics.increment("answer_topic_missing_total", finish_reason=finish_reason or "unknown")
+    if cache_key is not None:
+        answer_cache.set(cache_key, clean_latex(answer))
+        if topic:
+            topic_cache.set(cache_key, topic)
+        if SEMANTIC_CACHE_ENABLED:
+            semantic_cache.add(index_key, question, cache_key)
+
+ANSWER_ERROR = "Oops! An error occurred"
+
+@metrics.timed("chatbot_response")
+async def chatbot_response(grade, subject, question, request: gr.Request):
+    validation_error = validate_inputs(grade, subject, question)
+    if validation_error:
+        yield (
+            validation_error, gr.update(value="🎈 Show Me a Fun Fact!", visible=False), IDLE_AVATAR,
+            gr.update(value="", visible=False), gr.update(visible=False), gr.update(visible=True), gr.update(visible=False)
+        )
+        return
+    session = get_session(request)
+    language = "urdu" if is_roman_urdu(question) else "english"
+    cache_key = make_cache_key(grade, subject, language, question)
+    index_key = make_index_key(grade, subject, language)
+    conversation = session["conversation_history"]
+    # Answers to follow-ups depend on the chat so far, so only standalone questions use the shared caches
+    standalone = len(conversation) == 0 or not history.is_follow_up(question)
+    # The follow-up rate is the share of later questions that skip the shared caches
+    metrics.increment("questions_total", kind="first" if len(conversation) == 0 else "standalone" if standalone else "follow_up")
+    cached_answer = answer_cache.get(cache_key) if standalone else None
+    if cached_answer is None and standalone and SEMANTIC_CACHE_ENABLED:
+        similar_key = semantic_cache.lookup(index_key, question)
+        if similar_key is not None:
+            cached_answer = answer_cache.get(similar_key)
+            if cached_answer is not None:
+                logging.debug("Semantic cache matched %r to %s", question, similar_key)
+                cache_key = similar_key
+    session.update({
+        "grade": grade, "subject": subject, "question": question, "language": language,
+        # Fun facts for a follow-up are about the last answer's topic and stay out of the shared cache
+        "cache_key": cache_key if standalone else None,
+        "fun_fact_topic": None if standalone else conversation.last_topic()
+    })
+    start_fun_fact_prefetch(session)
+    if cached_answer is not None:
+        topic = topic_cache.get(cache_key)
+        conversation.add(question, cached_answer, topic)
+        fun_fact_label = f"🎈 Show Me a Fun Fact About {topic}" if topic else "🎈 Show Me a Fun Fact!"
+        yield (
+            cached_answer + "\n\n✨ " + random.choice(encouragement_phrases),
+            gr.update(value=fun_fact_label, visible=True),
+            IDLE_AVATAR,
+            gr.update(value="", visible=False),
+            gr.update(visible=False),  # clear_output_btn
+            gr.update(visible=True),  # speak_btn
+            gr.update(visible=False)  # audio_box
         )
-        answer = clean_latex(response.choices[0].message.content.strip())
-        logging.debug(f"Model response: {answer}")
+        return
+    messages = [{"role": "system", "content": get_system_prompt(grade, subject, language)}]
+    messages += [{"role": "user", "content": question}] if standalone else conversation.messages(question)
+    # Show the thinking avatar and clear the previous answer and its audio right away
+    # (typed questions already show it from SHOW_THINKING_JS; voice questions need it from here)
+    yield thinking_updates()
+    if standalone:
+        flight_key, start_stream = cache_key, lambda: stream_answer(messages, cache_key, index_key, question)
+    else:
+        flight_key, start_stream = None, lambda: stream_answer(messages)
+    answer = ""
+    # Only the new text of each chunk is cleaned; the full answer is cleaned once at the end
+    shown = ""
+    cleaner = LatexStreamCleaner()
+    try:
+        async for delta in answer_flights.stream(flight_key, start_stream):
+            answer += delta
+            shown += cleaner.feed(delta)
+            yield (strip_topic_trailer(shown),) + (gr.update(),) * 6
+        answer, topic = split_topic_trailer(answer)
+        answer = clean_latex(answer)
+        conversation.add(question, answer, topic)
     except Exception as e:
         logging.error(f"Error generating chatbot response: {e}")
-        answer = f"Oops! An error occurred: {str(e)}. Please try again later."
-    global_state["conversation_history"].append({"role": "assistant", "content": answer})
+        answer = f"{ANSWER_ERROR}: {str(e)}. Please try again later."
+        topic = None
     encouragement = random.choice(encouragement_phrases)
-    topic = extract_topic(answer, question)
     fun_fact_label = f"🎈 Show Me a Fun Fact About {topic}" if topic else "🎈 Show Me a Fun Fact!"
-    logging.debug(f"chatbot_response took {time.time() - start_time} seconds")
-    return (
+    yield (
         answer + "\n\n✨ " + encouragement,
         gr.update(value=fun_fact_label, visible=True),
-        avatar_update(False),
+        IDLE_AVATAR,
         gr.update(value="", visible=False),
-        gr.update(visible=False)  # clear_output_btn
+        gr.update(visible=False),  # clear_output_btn
+        gr.update(visible=True),  # speak_btn
+        gr.update()  # audio_box
     )
 
-def show_fun_fact(subject):
-    start_time = time.time()
-    question = global_state.get("question", "")
+@metrics.timed("show_fun_fact")
+async def show_fun_fact(subject, request: gr.Request):
+    session = get_session(request)
+    question = session.get("question", "")
     if not question:
-        logging.debug(f"show_fun_fact took {time.time() - start_time} seconds")
-        return (
-            "Please ask a question first to get a fun fact!",
-            gr.update(visible=True),
-            gr.update(value="", visible=False),
-            gr.update(visible=False)  # clear_output_btn
-        )
-    if question in global_state["fun_fact_cache"]:
-        logging.debug(f"show_fun_fact took {time.time() - start_time} seconds")
         return (
-            global_state["fun_fact_cache"][question],
-            gr.update(visible=True),
-            gr.update(value="", visible=False),
-            gr.update(visible=True)  # clear_output_btn
+            gr.update(value="Please ask a question first to get a fun fact!", visible=True),
+            gr.update(visible=True),  # speak_funfact_btn
+            gr.update(value="", visible=False),  # next_instruction
+            gr.update(visible=False),  # clear_output_btn
+            gr.update(visible=False)  # audio_funfact_box
         )
-    lang = "urdu" if is_roman_urdu(question) else "english"
-    fact = generate_fun_fact(global_state["subject"], global_state["grade"], question, lang)
-    logging.debug(f"show_fun_fact took {time.time() - start_time} seconds")
+    # Read before any await: Clear or a new question may change the session meanwhile
+    fact_args = (
+        session["subject"], session["grade"], question, session["language"], session["cache_key"], session["fun_fact_topic"]
+    )
+    task = session.get("prefetch_task")
+    fact = None
+    if task is not None and not task.cancelled():
+        try:
+            # Shielded so a cancelled click doesn't throw away the shared prefetch
+            fact = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # Only the prefetch was cancelled (Clear, a new question, session eviction)
+            if not task.cancelled():
+                raise
+    if fact is None:
+        fact = await generate_fun_fact(*fact_args)
     return (
-        fact,
-        gr.update(visible=True),
-        gr.update(value="", visible=False),
-        gr.update(visible=True)  # clear_output_btn
+        gr.update(value=fact, visible=True),
+        gr.update(visible=True),  # speak_funfact_btn
+        gr.update(value="", visible=False),  # next_instruction
+        gr.update(visible=True),  # clear_output_btn
+        gr.update(visible=False)  # audio_funfact_box
     )
 
-def use_transcription(audio):
-    start_time = time.time()
-    recognizer = sr.Recognizer()
+async def transcribe_question(audio):
     try:
-        with sr.AudioFile(audio) as source:
-            audio_data = recognizer.record(source)
-            result = recognizer.recognize_google(audio_data)
-            logging.debug(f"use_transcription took {time.time() - start_time} seconds")
-            return result
-    except Exception:
-        logging.debug(f"use_transcription took {time.time() - start_time} seconds")
-        return "Sorry, I couldn't understand. Please try again or type your question."
-
-def update_input_state(grade, subject):
-    start_time = time.time()
-    grade_valid = grade and grade != "Select Grade"
-    subject_valid = bool(subject)
-    is_ai_mode = subject == "Learn AI"
-    logging.debug(f"Update input state: Grade={grade}, Subject={subject}, AI Mode={is_ai_mode}")
-    if grade_valid and subject_valid and not is_ai_mode:
-        logging.debug("Normal mode: Hiding AI buttons")
-        result = (
-            gr.update(interactive=True, placeholder="❓ Ask your question here (in English or Roman Urdu), then press Enter!", visible=True),
-            gr.update(interactive=True),
-            gr.update(visible=False),
-            gr.update(visible=False),
-            gr.update(visible=False),
-            gr.update(visible=False),
-            gr.update(visible=False)
-        )
-    elif grade_valid and subject_valid and is_ai_mode:
-        logging.debug("AI mode: Showing AI buttons")
-        result = (
-            gr.update(interactive=False, placeholder="🤖 You're in AI Learning Mode! Use the buttons on the right to explore AI concepts.", visible=False),
-            gr.update(interactive=False),
-            gr.update(visible=False),
-            gr.update(visible=True),
-            gr.update(visible=True),
-            gr.update(visible=True),
-            gr.update(visible=False)
-        )
-    else:
-        logging.debug("Invalid selection: Hiding all buttons")
-        placeholder = "🎯 Please select your grade and subject first to enable the Ask Now! button."
-        result = (
-            gr.update(interactive=False, placeholder=placeholder, visible=True),
-            gr.update(interactive=False),
-            gr.update(visible=False),
-            gr.update(visible=False),
-            gr.update(visible=False),
-            gr.update(visible=False),
-            gr.update(visible=False)
-        )
-    logging.debug(f"update_input_state took {time.time() - start_time} seconds")
-    return result
+        result, ok = await speech.transcribe_async(audio), True
+    except speech.TranscriptionBusy:
+        result, ok = "🎤 Lots of friends are talking right now! Please try again in a moment or type your question.", False
+    except Exception as e:
+        logging.debug("Transcription failed: %r", e)
+        result, ok = "Sorry, I couldn't understand. Please try again or type your question.", False
+    return result, ok
+
+def first_stream_chunk(path):
+    # Gradio keeps the WAV header only on the first chunk of a stream, and the voice
+    # player's first chunk was an empty placeholder. So the first clip goes out as
+    # bytes with its header, lengths marked unknown the way gradio marks them.
+    with open(path, "rb") as f:
+        data = f.read()
+    if path.endswith(".wav"):
+        data = data[:4] + b"\xff\xff\xff\xff" + data[8:40] + b"\xff\xff\xff\xff" + data[44:]
+    return data
+
+@metrics.timed("voice_pipeline")
+async def voice_pipeline(audio, grade, subject, voice_mode, voice_speak, request: gr.Request):
+    # Outputs: question_input, CHAT_OUTPUTS, then the streaming audio_out. Every
+    # update to a streaming player must be audio; an empty chunk means "nothing yet"
+    unchanged = (gr.update(),) * (len(CHAT_OUTPUTS) - 1)
+    if not audio:
+        yield (gr.update(),) + unchanged + (gr.update(visible=False), b"")
+        return
+    question, ok = await transcribe_question(audio)
+    yield (question,) + unchanged + (gr.update(visible=False), b"")
+    if not voice_mode or not ok:
+        return
+    # Answer straight away instead of waiting for the student to press "Ask Now!"
+    answer = ""
+    async for outputs in chatbot_response(grade, subject, question, request):
+        if isinstance(outputs[0], str):
+            answer = outputs[0]
+        yield (gr.update(),) + tuple(outputs) + (b"",)
+    if not voice_speak or not answer.strip() or answer.startswith(ANSWER_ERROR) or validate_inputs(grade, subject, question):
+        return
+    try:
+        first = True
+        async for path in tts.synthesize_chunks_async(answer):
+            yield (gr.update(),) + unchanged + (gr.update(visible=True), first_stream_chunk(path) if first else path)
+            first = False
+    except Exception as e:
+        # The written answer is already on screen; only the spoken one is lost
+        logging.error(f"Error in voice_pipeline speech: {e}")
 
-def clear_all(grade, subject):
-    start_time = time.time()
-    ai_state["index"] = 0
-    ai_state["active"] = False
-    global_state["question"] = ""
-    global_state["conversation_history"] = []
-    global_state["topic_cache"] = {}
-    global_state["fun_fact_cache"] = {}
-    logging.debug("Clearing all state and updating input state")
-    reset_outputs = (
-        "",  # response_output
-        "",  # fun_fact_output
-        gr.update(value="", interactive=False, placeholder="🎯 Please select your grade and subject first to enable the Ask Now! button.", visible=True),
-        None,  # audio_input reset
-        gr.update(value="🎈 Show Me a Fun Fact!", visible=False),  # fun_fact_btn
-        gr.update(interactive=False),
-        "<div style='font-size: 5em; text-align: center;'>🤖</div>",
-        grade,  # grade (retain current value)
-        subject,  # subject (retain current value)
-        gr.update(visible=False),  # speak_btn
-        gr.update(visible=False),  # audio_out
-        gr.update(visible=False),  # speak_funfact_btn
-        gr.update(visible=False),  # audio_funfact_out
-        gr.update(visible=False),  # real_life_app_btn
-        gr.update(visible=False),  # next_concept_btn
-        gr.update(visible=False),  # btn_ai_exit
-        gr.update(visible=False),  # ai_header
-        gr.update(visible=False),  # ai_progress
-        gr.update(value="### 🗣️ Prefer speaking? Tap the mic below and ask your question out loud!", visible=True),  # mic_instructions
-        gr.update(label="💡 Fun Fact or Real-Life Example", value="", visible=False),  # fun_fact_output
-        gr.update(value="", visible=False),  # next_instruction
-        gr.update(visible=False)   # clear_output_btn
-    )
-    input_state = update_input_state(grade, subject)
-    logging.debug(f"clear_all took {time.time() - start_time} seconds")
-    return reset_outputs + input_state
+@metrics.timed("clear_all")
+def clear_all(grade, subject, request: gr.Request):
+    session = get_session(request)
+    reset_session(session, subject)
+    return as_outputs(render_reset(grade, subject, session), RESET_OUTPUTS)
 
+@metrics.timed("tts_output")
 def tts_output(text):
-    start_time = time.time()
+    # Outputs: the player's wrapper column, then the streaming player
     if not text.strip():
-        logging.debug(f"tts_output took {time.time() - start_time} seconds")
-        return None
+        yield gr.update(visible=False), None
+        return
     try:
-        tts = gTTS(text)
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as fp:
-            tts.save(fp.name)
-            logging.debug(f"tts_output took {time.time() - start_time} seconds")
-            return fp.name
+        # Sentence clips stream into the player as soon as each one is ready
+        for path in tts.synthesize_chunks(text):
+            yield gr.update(visible=True), path
     except Exception as e:
         logging.error(f"Error in tts_output: {e}")
-        logging.debug(f"tts_output took {time.time() - start_time} seconds")
-        return None
 
-def show_speaker(text):
+def concept_audio_texts(concepts):
+    # Exactly the strings the AI mode shows, so "Listen" on a concept is a cache hit
+    for concept in concepts:
+        for explanation, application in zip(concept.explanations, concept.applications):
+            yield format_concept(concept, explanation)
+            yield application
+
+def warm_concept_audio(parallel=False):
     start_time = time.time()
-    result = gr.update(visible=bool(text.strip()))
-    logging.debug(f"show_speaker took {time.time() - start_time} seconds")
-    return result
+    built = tts.warm_cache(concept_audio_texts(get_concepts()), parallel=parallel)
+    logging.info(f"Prebuilt {built} AI concept audio clips in {time.time() - start_time:.1f} seconds")
 
 css = """
 .input-panel {
@@ -781,278 +766,170 @@ css = """
 }
 """
 
-with gr.Blocks(theme=gr.themes.Soft(), css=css) as demo:
-    gr.Markdown("""# Pakistan's First AI Learning Companion — Proudly Created by Astra Mentors
-Revolutionizing Education for Grades 3 to 6""")
-    with gr.Row():
-        with gr.Column(elem_classes="input-panel"):
-            grade = gr.Dropdown(
-                choices=["Select Grade", "3", "4", "5", "6"],
-                value="Select Grade",
-                label="🎓 Select Your Grade",
-                elem_id="grade_dropdown"
-            )
-            subject = gr.Radio(
-                choices=["Math", "Science", "English", "Learn AI"],
-                label="📚 Pick a Subject",
-                elem_id="subject_radio"
-            )
-            question_input = gr.Textbox(
-                label="❓ Ask Your Question (in English or Roman Urdu)",
-                lines=1,
-                elem_id="question_input",
-                placeholder="🎯 Please select your grade and subject first to enable the Ask Now! button.",
-                interactive=False,
-                show_label=True,
-                submit_btn=None
-            )
-            mic_instructions = gr.Markdown("### 🗣️ Prefer speaking? Tap the mic below and ask your question out loud!")
-            audio_input = gr.Audio(
-                sources=["microphone"],
-                type="filepath",
-                label="🎤 Speak Your Question",
-                elem_id="audio_input"
-            )
-            with gr.Row():
-                ask_btn = gr.Button(
-                    "✅ Ask Now!",
-                    variant="primary",
-                    elem_id="ask_button",
+def build_demo():
+    # Gradio keeps its own copy of every served audio file; clear copies older than an hour
+    with gr.Blocks(theme=gr.themes.Soft(), css=css, delete_cache=(3600, 3600)) as demo:
+        gr.Markdown("""# Pakistan's First AI Learning Companion — Proudly Created by Astra Mentors
+    Revolutionizing Education for Grades 3 to 6""")
+        with gr.Row():
+            with gr.Column(elem_classes="input-panel"):
+                grade = gr.Dropdown(
+                    choices=["Select Grade"] + GRADES,
+                    value="Select Grade",
+                    label="🎓 Select Your Grade",
+                    elem_id="grade_dropdown"
+                )
+                subject = gr.Radio(
+                    choices=SUBJECTS + ["Learn AI"],
+                    label="📚 Pick a Subject",
+                    elem_id="subject_radio"
+                )
+                question_input = gr.Textbox(
+                    label="❓ Ask Your Question (in English or Roman Urdu)",
+                    lines=1,
+                    elem_id="question_input",
+                    placeholder="🎯 Please select your grade and subject first to enable the Ask Now! button.",
+                    interactive=False,
+                    show_label=True
+                )
+                mic_instructions = gr.Markdown("### 🗣️ Prefer speaking? Tap the mic below and ask your question out loud!")
+                audio_input = gr.Audio(
+                    sources=["microphone"],
+                    type="filepath",
+                    label="🎤 Speak Your Question",
+                    elem_id="audio_input"
+                )
+                with gr.Row():
+                    voice_mode = gr.Checkbox(label="⚡ Answer as soon as I stop talking", value=False, elem_id="voice_mode")
+                    voice_speak = gr.Checkbox(label="🔊 Read the answer out loud", value=False, elem_id="voice_speak")
+                with gr.Row():
+                    ask_btn = gr.Button(
+                        "✅ Ask Now!",
+                        variant="primary",
+                        elem_id="ask_button",
+                        interactive=False
+                    )
+                    clear_btn = gr.Button(
+                        "🧼 Clear",
+                        variant="secondary",
+                        elem_id="clear_button"
+                    )
+            with gr.Column(elem_classes="output-panel"):
+                ai_header = gr.Markdown("", visible=False)
+                ai_progress = gr.Markdown("", visible=False)
+                avatar = gr.Markdown(IDLE_AVATAR, elem_id="avatar")
+                response_output = gr.Textbox(
+                    label="My Classmate AI Says:",
+                    lines=5,
+                    elem_id="response_output",
                     interactive=False
                 )
-                clear_btn = gr.Button(
-                    "🧼 Clear",
-                    variant="secondary",
-                    elem_id="clear_button"
+                with gr.Row():
+                    gr.Markdown("")
+                    speak_btn = gr.Button("🔊 Listen", elem_id="speak_button", visible=False, size="sm")
+                # Streaming players only take audio from generators, so their visibility is set on a wrapper
+                with gr.Column(visible=False) as audio_box:
+                    audio_out = gr.Audio(label="Listen", elem_id="audio_out", interactive=False, streaming=True, autoplay=True)
+                fun_fact_btn = gr.Button(
+                    "🎈 Show Me a Fun Fact!", variant="primary", elem_id="fun_fact_button", visible=False
                 )
-        with gr.Column(elem_classes="output-panel"):
-            ai_header = gr.Markdown("", visible=False)
-            ai_progress = gr.Markdown("", visible=False)
-            avatar = gr.Markdown("<div class='avatar' role='img' aria-label='Chatbot avatar'>🤖</div>", elem_id="avatar")
-            response_output = gr.Textbox(
-                label="My Classmate AI Says:",
-                lines=5,
-                elem_id="response_output",
-                interactive=False
-            )
-            with gr.Row():
-                gr.Markdown("")
-                speak_btn = gr.Button("🔊 Listen", elem_id="speak_button", visible=False, size="sm")
-            audio_out = gr.Audio(label="Listen", elem_id="audio_out", interactive=False, visible=False)
-            fun_fact_btn = gr.Button(
-                "🎈 Show Me a Fun Fact!", variant="primary", elem_id="fun_fact_button", visible=False
-            )
-            real_life_app_btn = gr.Button(
-                "💡 Real-Life Application", variant="primary", elem_id="real_life_app_btn", visible=False
+                real_life_app_btn = gr.Button(
+                    "💡 Real-Life Application", variant="primary", elem_id="real_life_app_btn", visible=False
+                )
+                fun_fact_output = gr.Textbox(
+                    label="💡 Fun Fact or Real-Life Example",
+                    lines=3,
+                    elem_id="fun_fact_output",
+                    interactive=False,
+                    visible=False
+                )
+                with gr.Row():
+                    gr.Markdown("")
+                    speak_funfact_btn = gr.Button("🔊 Listen", elem_id="speak_funfact_btn", visible=False, size="sm")
+                with gr.Column(visible=False) as audio_funfact_box:
+                    audio_funfact_out = gr.Audio(label="Listen", elem_id="audio_funfact_out", interactive=False, streaming=True, autoplay=True)
+                with gr.Row():
+                    next_concept_btn = gr.Button("Next Concept", variant="primary", visible=False)
+                    btn_ai_exit = gr.Button("Exit AI Mode", variant="secondary", visible=False)
+                next_instruction = gr.Markdown("", elem_classes="next-instruction", visible=False)
+                with gr.Row():
+                    gr.Markdown("")
+                    clear_output_btn = gr.Button("🧼 Start New Question!", variant="primary", visible=False)
+
+        gr.Markdown(
+            """<div class='footer-note' role='contentinfo'>
+    <strong>Made with ❤️ by <a href='https://astramentors.co' target='_blank'>Astra Mentors</a> | Contact: <a href='mailto:ceo@astramentors.com'>ceo@astramentors.com</a></strong>
+    <br>
+    <em>We respect your privacy. No student data is stored or shared.</em>
+    </div>"""
+        )
+
+        ui = {
+            "grade": grade, "subject": subject, "question_input": question_input, "audio_input": audio_input,
+            "mic_instructions": mic_instructions, "ask_btn": ask_btn, "ai_header": ai_header, "ai_progress": ai_progress,
+            "avatar": avatar, "response_output": response_output, "speak_btn": speak_btn, "audio_box": audio_box,
+            "fun_fact_btn": fun_fact_btn, "real_life_app_btn": real_life_app_btn, "fun_fact_output": fun_fact_output,
+            "speak_funfact_btn": speak_funfact_btn, "audio_funfact_box": audio_funfact_box,
+            "next_concept_btn": next_concept_btn, "btn_ai_exit": btn_ai_exit, "next_instruction": next_instruction,
+            "clear_output_btn": clear_output_btn
+        }
+
+        def components(names):
+            return [ui[name] for name in names]
+
+        # .input rather than .change: only the student's own picks redraw the screen,
+        # not the subject reset done by Exit AI Mode. Handlers that only read session
+        # state skip the queue, which is kept for model, speech and audio calls.
+        for selector in (grade, subject):
+            selector.input(fn=on_selection_change, inputs=[grade, subject], outputs=components(SCREEN_OUTPUTS), queue=False)
+
+        next_concept_btn.click(fn=next_ai_concept, inputs=grade, outputs=components(NEXT_CONCEPT_OUTPUTS), queue=False)
+        btn_ai_exit.click(fn=exit_ai_mode, inputs=grade, outputs=components(RESET_OUTPUTS), queue=False)
+        real_life_app_btn.click(fn=show_real_life_application, inputs=grade, outputs=components(FUN_FACT_OUTPUTS), queue=False)
+
+        # Only recordings the student makes; resetting the recording from Clear is not an event
+        answer_events = [audio_input.input(
+            fn=voice_pipeline,
+            inputs=[audio_input, grade, subject, voice_mode, voice_speak],
+            outputs=components(["question_input"] + CHAT_OUTPUTS) + [audio_out]
+        )]
+        for trigger in (question_input.submit, ask_btn.click):
+            trigger(fn=None, js=SHOW_THINKING_JS, outputs=components(CHAT_OUTPUTS), show_api=False)
+            answer_events.append(
+                trigger(fn=chatbot_response, inputs=[grade, subject, question_input], outputs=components(CHAT_OUTPUTS))
             )
-            fun_fact_output = gr.Textbox(
-                label="💡 Fun Fact or Real-Life Example",
-                lines=3,
-                elem_id="fun_fact_output",
-                interactive=False,
-                visible=False
+        fun_fact_btn.click(fn=show_fun_fact, inputs=subject, outputs=components(FUN_FACT_OUTPUTS))
+        # Clearing stops an answer that is still streaming, so it can't redraw the
+        # cleared screen or land in the conversation that was just reset
+        for clear_button in (clear_btn, clear_output_btn):
+            clear_button.click(
+                fn=clear_all, inputs=[grade, subject], outputs=components(RESET_OUTPUTS), queue=False, cancels=answer_events
             )
-            with gr.Row():
-                gr.Markdown("")
-                speak_funfact_btn = gr.Button("🔊 Listen", elem_id="speak_funfact_btn", visible=False, size="sm")
-            audio_funfact_out = gr.Audio(label="Listen", elem_id="audio_funfact_out", interactive=False, visible=False)
-            with gr.Row():
-                next_concept_btn = gr.Button("Next Concept", variant="primary", visible=False)
-                btn_ai_exit = gr.Button("Exit AI Mode", variant="secondary", visible=False)
-            next_instruction = gr.Markdown("", elem_classes="next-instruction", visible=False)
-            with gr.Row():
-                gr.Markdown("")
-                clear_output_btn = gr.Button("🧼 Start New Question!", variant="primary", visible=False)
-
-    gr.Markdown(
-        """<div class='footer-note' role='contentinfo'>
-<strong>Made with ❤️ by <a href='https://astramentors.co' target='_blank'>Astra Mentors</a> | Contact: <a href='mailto:ceo@astramentors.com'>ceo@astramentors.com</a></strong>
-<br>
-<em>We respect your privacy. No student data is stored or shared.</em>
-</div>"""
-    )
+        speak_btn.click(fn=tts_output, inputs=response_output, outputs=[audio_box, audio_out])
+        speak_funfact_btn.click(fn=tts_output, inputs=fun_fact_output, outputs=[audio_funfact_box, audio_funfact_out])
 
-    grade.change(
-        fn=update_input_state,
-        inputs=[grade, subject],
-        outputs=[question_input, ask_btn, fun_fact_btn, real_life_app_btn, next_concept_btn, btn_ai_exit, clear_output_btn]
-    )
-    subject.change(
-        fn=update_input_state,
-        inputs=[grade, subject],
-        outputs=[question_input, ask_btn, fun_fact_btn, real_life_app_btn, next_concept_btn, btn_ai_exit, clear_output_btn]
-    )
-
-    subject.change(
-        fn=on_subject_change,
-        inputs=[subject, grade],
-        outputs=[
-            ai_header, ai_progress, response_output, fun_fact_output,
-            real_life_app_btn, next_concept_btn, btn_ai_exit, fun_fact_btn,
-            question_input, ask_btn, audio_input,
-            mic_instructions, fun_fact_output, next_instruction,
-            speak_btn, audio_out, clear_output_btn
-        ]
-    ).then(
-        fn=update_input_state,
-        inputs=[grade, subject],
-        outputs=[question_input, ask_btn, fun_fact_btn, real_life_app_btn, next_concept_btn, btn_ai_exit, clear_output_btn]
-    )
-    grade.change(
-        fn=on_grade_change,
-        inputs=[grade, subject],
-        outputs=[
-            ai_header, ai_progress, response_output, fun_fact_output,
-            real_life_app_btn, next_concept_btn, btn_ai_exit, fun_fact_btn,
-            question_input, ask_btn, audio_input,
-            mic_instructions, fun_fact_output, next_instruction,
-            speak_btn, audio_out, clear_output_btn
-        ]
-    ).then(
-        fn=update_input_state,
-        inputs=[grade, subject],
-        outputs=[question_input, ask_btn, fun_fact_btn, real_life_app_btn, next_concept_btn, btn_ai_exit, clear_output_btn]
-    )
-
-    next_concept_btn.click(
-        fn=next_ai_concept,
-        inputs=grade,
-        outputs=[
-            ai_progress, response_output, fun_fact_output, real_life_app_btn,
-            next_concept_btn, btn_ai_exit, speak_btn, speak_funfact_btn,
-            next_instruction, audio_out, clear_output_btn
-        ]
-    ).then(
-        fn=show_speaker,
-        inputs=response_output,
-        outputs=speak_btn
-    ).then(
-        fn=lambda _: gr.update(visible=False),
-        inputs=None,
-        outputs=audio_out
-    )
+        demo.unload(end_session)
 
-    btn_ai_exit.click(
-        fn=exit_ai_mode,
-        inputs=[grade, subject],
-        outputs=[
-            response_output, fun_fact_output, question_input, audio_input,
-            fun_fact_btn, ask_btn, avatar, grade, subject,
-            speak_btn, audio_out, speak_funfact_btn, audio_funfact_out,
-            real_life_app_btn, next_concept_btn, btn_ai_exit,
-            ai_header, ai_progress, mic_instructions, fun_fact_output,
-            next_instruction, clear_output_btn,
-            question_input, ask_btn, fun_fact_btn, real_life_app_btn, next_concept_btn, btn_ai_exit, clear_output_btn
-        ]
-    )
-
-    real_life_app_btn.click(
-        fn=show_real_life_application,
-        inputs=grade,
-        outputs=[
-            fun_fact_output, speak_funfact_btn, next_instruction, clear_output_btn
-        ]
-    ).then(
-        fn=show_speaker,
-        inputs=fun_fact_output,
-        outputs=speak_funfact_btn
-    ).then(
-        fn=lambda _: gr.update(visible=False),
-        inputs=None,
-        outputs=audio_funfact_out
-    )
-
-    audio_input.change(
-        fn=use_transcription,
-        inputs=audio_input,
-        outputs=question_input
-    )
-    question_input.submit(
-        fn=chatbot_response,
-        inputs=[grade, subject, question_input],
-        outputs=[response_output, fun_fact_btn, avatar, next_instruction, clear_output_btn]
-    ).then(
-        fn=show_speaker,
-        inputs=response_output,
-        outputs=speak_btn
-    ).then(
-        fn=lambda _: gr.update(visible=False),
-        inputs=None,
-        outputs=audio_out
-    )
-    ask_btn.click(
-        fn=chatbot_response,
-        inputs=[grade, subject, question_input],
-        outputs=[response_output, fun_fact_btn, avatar, next_instruction, clear_output_btn]
-    ).then(
-        fn=show_speaker,
-        inputs=response_output,
-        outputs=speak_btn
-    ).then(
-        fn=lambda _: gr.update(visible=False),
-        inputs=None,
-        outputs=audio_out
-    )
-    fun_fact_btn.click(
-        fn=show_fun_fact,
-        inputs=subject,
-        outputs=[fun_fact_output, fun_fact_output, next_instruction, clear_output_btn]
-    ).then(
-        fn=show_speaker,
-        inputs=fun_fact_output,
-        outputs=speak_funfact_btn
-    ).then(
-        fn=lambda _: gr.update(visible=False),
-        inputs=None,
-        outputs=audio_funfact_out
-    )
-    clear_btn.click(
-        fn=clear_all,
-        inputs=[grade, subject],
-        outputs=[
-            response_output, fun_fact_output, question_input, audio_input,
-            fun_fact_btn, ask_btn, avatar, grade, subject,
-            speak_btn, audio_out, speak_funfact_btn, audio_funfact_out,
-            real_life_app_btn, next_concept_btn, btn_ai_exit,
-            ai_header, ai_progress, mic_instructions, fun_fact_output,
-            next_instruction, clear_output_btn,
-            question_input, ask_btn, fun_fact_btn, real_life_app_btn, next_concept_btn, btn_ai_exit, clear_output_btn
-        ]
-    )
-    clear_output_btn.click(
-        fn=clear_all,
-        inputs=[grade, subject],
-        outputs=[
-            response_output, fun_fact_output, question_input, audio_input,
-            fun_fact_btn, ask_btn, avatar, grade, subject,
-            speak_btn, audio_out, speak_funfact_btn, audio_funfact_out,
-            real_life_app_btn, next_concept_btn, btn_ai_exit,
-            ai_header, ai_progress, mic_instructions, fun_fact_output,
-            next_instruction, clear_output_btn,
-            question_input, ask_btn, fun_fact_btn, real_life_app_btn, next_concept_btn, btn_ai_exit, clear_output_btn
-        ]
-    )
-    speak_btn.click(
-        fn=tts_output,
-        inputs=response_output,
-        outputs=audio_out
-    ).then(
-        fn=lambda _: gr.update(visible=True),
-        inputs=None,
-        outputs=audio_out
-    )
-    speak_funfact_btn.click(
-        fn=tts_output,
-        inputs=fun_fact_output,
-        outputs=audio_funfact_out
-    ).then(
-        fn=lambda _: gr.update(visible=True),
-        inputs=None,
-        outputs=audio_funfact_out
-    )
+    demo.queue(default_concurrency_limit=GRADIO_CONCURRENCY_LIMIT)
+    return demo
 
 # Launch the app
 if __name__ == "__main__":
-    start_time = time.time()
+    parser = argparse.ArgumentParser(description="Pakistan's AI Learning Companion")
+    parser.add_argument("--warm-audio", action="store_true", help="prebuild AI concept audio into the TTS cache and exit")
+    args = parser.parse_args()
+    if args.warm_audio:
+        warm_concept_audio(parallel=True)
+        raise SystemExit(0)
+    # Fail fast on a missing key instead of on the first student's question
+    load_openai_key()
+    if os.environ.get("PREBUILD_CONCEPT_AUDIO", "1") == "1":
+        # One clip at a time, so the warm-up never holds up a student's "Listen"
+        threading.Thread(target=warm_concept_audio, name="warm-concept-audio", daemon=True).start()
+    if os.environ.get("METRICS_PORT"):
+        metrics.start_server(int(os.environ["METRICS_PORT"]))
+    if os.environ.get("METRICS_LOG_INTERVAL"):
+        metrics.start_periodic_dump(float(os.environ["METRICS_LOG_INTERVAL"]))
+    demo = build_demo()
+    logging.info(f"Startup took {time.perf_counter() - STARTUP_BEGIN:.2f} seconds")
     demo.launch(share=True)
-    logging.debug(f"App launch took {time.time() - start_time} seconds")
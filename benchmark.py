@@ -0,0 +1,578 @@
+"""Offline benchmarks for the Learn AI chatbot.
+
+Nothing here needs the network or an OpenAI key: chat completions are served by
+a local stand-in for the OpenAI API with configurable latency, streaming and
+error injection.
+
+Usage:
+    python benchmark.py load [--students 40] [--rounds 5] [--questions 20] [--latency 0.3]
+    python benchmark.py mock-server [--port 8765] [--latency 0.3]
+    python benchmark.py prompts [--answers-per-day 10000]
+    python benchmark.py events
+    python benchmark.py language [--repeat 2000]
+    python benchmark.py latex [--repeat 200] [--chunk 8]
+    python benchmark.py tts [--backends gtts espeak] [--sentences 20] [--workers 4]
+
+Point the real app at the mock server with
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=sk-mock python app.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import resource
+import tempfile
+import threading
+import time
+import types
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAMPLE_SENTENCES = [
+    "Plants make their own food from sunlight, water and air!",
+    "A fraction tells us how many equal parts of a whole we have.",
+    "The Indus River flows all the way from the mountains to the Arabian Sea.",
+    "Robots use sensors to see and feel the world around them.",
+    "Nouns are naming words, like Lahore, cricket and teacher!",
+    "Gravity is the invisible pull that keeps our feet on the ground.",
+    "Multiplying by ten just adds a zero to the end of a whole number.",
+    "Machine learning helps computers get better by practicing with examples."
+]
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def format_ms(seconds):
+    return f"{seconds * 1000:8.1f} ms"
+
+# --- Mock OpenAI chat completions server ---
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so the client's connection pool is exercised
+
+    def do_POST(self):
+        config = self.server.config
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with self.server.lock:
+            self.server.calls += 1
+        time.sleep(config.latency)
+        if random.random() < config.error_rate:
+            self._send_json(500, {"error": {"message": "Injected failure", "type": "server_error"}})
+            return
+        messages = body.get("messages", [])
+        prompt = " ".join(message.get("content", "") for message in messages)
+        reply = mock_reply(messages)
+        usage = {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": len(reply) // 4,
+            "total_tokens": (len(prompt) + len(reply)) // 4
+        }
+        model = body.get("model", "mock")
+        if not body.get("stream"):
+            self._send_json(200, {
+                "id": "chatcmpl-mock", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                "usage": usage
+            })
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        tokens = [word + " " for word in reply.split(" ")]
+        for token in tokens:
+            time.sleep(config.token_delay)
+            self._send_event({
+                "id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]
+            })
+        self._send_event({
+            "id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+        })
+        if body.get("stream_options", {}).get("include_usage"):
+            self._send_event({
+                "id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [], "usage": usage
+            })
+        self._send_chunk(b"data: [DONE]\n\n")
+        self._send_chunk(b"")
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_event(self, payload):
+        self._send_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+    def _send_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+def mock_reply(messages):
+    question = messages[-1].get("content", "") if messages else ""
+    if messages and messages[0].get("role") == "system":
+        # Answers end with the topic trailer the app asks for
+        return (
+            "Great question! 🌟 Here is a simple answer about your question, explained step by step "
+            "with a fun example from Lahore! 🚀 Keep asking and keep learning! 💡\nTOPIC: Mock topic"
+        )
+    return f"Fun fact: {question[:60]} is connected to lots of amazing things around us! 🎈"
+
+def start_mock_server(port=0, latency=0.3, token_delay=0.01, error_rate=0.0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockOpenAIHandler)
+    server.daemon_threads = True
+    server.config = types.SimpleNamespace(latency=latency, token_delay=token_delay, error_rate=error_rate)
+    server.calls = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, name="mock-openai", daemon=True).start()
+    return server
+
+def run_mock_server(args):
+    server = start_mock_server(args.port, args.latency, args.token_delay, args.error_rate)
+    print(f"Mock OpenAI server on http://127.0.0.1:{server.server_address[1]}/v1 (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+class MockTTSBackend:
+    name = "mock"
+    suffix = ".mp3"
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def synthesize_to_file(self, text, lang, path):
+        time.sleep(self.latency)
+        with open(path, "wb") as fp:
+            fp.write(b"ID3" + text.encode("utf-8"))
+
+# --- Load test of the Gradio handlers ---
+
+QUESTION_TOPICS = [
+    "photosynthesis", "gravity", "fractions", "the water cycle", "nouns", "magnets", "the solar system",
+    "multiplication", "volcanoes", "verbs", "electricity", "the human heart", "rainbows", "decimals",
+    "adjectives", "sound", "clouds", "angles", "germs", "the moon"
+]
+
+def load_app(args, audio_dir):
+    # Configure before importing app, which reads its settings at import time
+    server = start_mock_server(0, args.latency, args.token_delay, args.error_rate)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ["OPENAI_API_KEY"] = "sk-mock"
+    os.environ["AUDIO_CACHE_DIR"] = audio_dir
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("CACHE_BACKEND", "memory")
+    import app
+    import tts
+    tts.backend = MockTTSBackend(args.tts_latency)
+    return app, server
+
+async def simulate_student(app, student, args, questions, results):
+    request = types.SimpleNamespace(session_hash=f"student-{student}")
+    grade = str(3 + student % 4)
+    for _ in range(args.rounds):
+        question = random.choice(questions)
+        start = time.perf_counter()
+        first_update = None
+        answer = ""
+        async for outputs in app.chatbot_response(grade, "Science", question, request):
+            if first_update is None and isinstance(outputs[0], str) and outputs[0]:
+                first_update = time.perf_counter() - start
+            if isinstance(outputs[0], str):
+                answer = outputs[0]
+        results["chatbot_response"].append(time.perf_counter() - start)
+        results["chatbot_response first text"].append(first_update or 0.0)
+
+        start = time.perf_counter()
+        await app.show_fun_fact("Science", request)
+        results["show_fun_fact"].append(time.perf_counter() - start)
+
+        if args.tts:
+            start = time.perf_counter()
+            await asyncio.to_thread(lambda: list(app.tts_output(answer)))
+            results["tts_output"].append(time.perf_counter() - start)
+
+async def run_load(app, args):
+    # Fewer distinct questions means more answers come from the shared caches
+    questions = [
+        f"What is {QUESTION_TOPICS[i % len(QUESTION_TOPICS)]}? Part {i // len(QUESTION_TOPICS) + 1}"
+        for i in range(args.questions)
+    ]
+    results = {name: [] for name in ("chatbot_response", "chatbot_response first text", "show_fun_fact", "tts_output")}
+    start = time.perf_counter()
+    await asyncio.gather(*[simulate_student(app, student, args, questions, results) for student in range(args.students)])
+    return results, time.perf_counter() - start
+
+def bench_load(args):
+    random.seed(args.seed)
+    with tempfile.TemporaryDirectory() as audio_dir:
+        app, server = load_app(args, audio_dir)
+        results, elapsed = asyncio.run(run_load(app, args))
+    interactions = args.students * args.rounds
+    print(
+        f"Load: {args.students} students x {args.rounds} rounds, {args.questions} distinct questions, "
+        f"mock latency {args.latency * 1000:.0f} ms + {args.token_delay * 1000:.0f} ms/token, "
+        f"error rate {args.error_rate:.0%}"
+    )
+    print(f"{'handler':<28} {'p50':>11} {'p95':>11} {'p99':>11} {'max':>11}")
+    for name, latencies in results.items():
+        if latencies:
+            print(
+                f"{name:<28} {format_ms(percentile(latencies, 50))} {format_ms(percentile(latencies, 95))} "
+                f"{format_ms(percentile(latencies, 99))} {format_ms(max(latencies))}"
+            )
+    print(f"throughput: {interactions / elapsed:.1f} questions/sec over {elapsed:.1f} s")
+    print(f"model calls: {server.calls} ({server.calls / interactions:.2f} per question)")
+    print(f"peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+    server.shutdown()
+
+# --- Prompt token accounting ---
+
+# The single multi-grade system prompt every answer used to send, for comparison
+LEGACY_SYSTEM_PROMPT = (
+    "You are a super fun, energetic, and friendly AI tutor for Pakistani kids! "
+    "For Grade 3: Use VERY simple words, short sentences, and LOTS of emojis. Be playful and use exclamation marks! "
+    "For Grade 4: Use simple explanations, basic examples, and plenty of emojis and excitement. "
+    "For Grade 5: Give clear, slightly more detailed answers, but still keep it lively and positive. "
+    "For Grade 6: Give thoughtful, slightly advanced explanations, but keep the tone friendly and encouraging. "
+    "You are currently talking to a Grade {grade} student studying {subject}, so adjust accordingly. "
+    "Always use fun language, exclamation marks, and at least 2-3 emojis per answer! "
+    "Accept Roman Urdu or English. "
+    "Answer strictly {language}. Do not mix languages. "
+    "Do NOT use LaTeX or equations. Use plain language and numbers only. "
+    "If the question is unclear, gently try to help anyway. "
+    "After your answer, add one last line in the form 'TOPIC: <main topic in 1 to 3 words>'."
+)
+
+def make_token_counter():
+    try:
+        import tiktoken
+        encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
+        return lambda text: len(encoding.encode(text)), "tiktoken"
+    except Exception:
+        # Close enough for English prompts when tiktoken isn't installed
+        return lambda text: (len(text) + 3) // 4, "estimated at 4 characters per token"
+
+def count_message_tokens(count, messages):
+    # Chat formatting adds a few tokens per message plus the reply priming
+    return sum(count(message["content"]) + 3 for message in messages) + 3
+
+def bench_prompts(args):
+    os.environ.setdefault("OPENAI_API_KEY", "sk-mock")
+    os.environ.setdefault("PREBUILD_CONCEPT_AUDIO", "0")
+    import app
+    count, method = make_token_counter()
+    question = {"english": "What is photosynthesis?", "urdu": "Photosynthesis kya hota hai?"}
+    print(f"Input tokens per request ({method}), {len(app.SYSTEM_PROMPTS)} precompiled system prompts")
+    print(f"{'request':<26} {'before':>8} {'after':>8} {'saved':>8}")
+    saved_total = 0
+    rows = 0
+    for grade in app.GRADES:
+        for language in app.LANGUAGES:
+            legacy = LEGACY_SYSTEM_PROMPT.format(
+                grade=grade, subject="science", language="in Roman Urdu" if language == "urdu" else "in English"
+            )
+            user = {"role": "user", "content": question[language]}
+            before = count_message_tokens(count, [{"role": "system", "content": legacy}, user])
+            after = count_message_tokens(count, [
+                {"role": "system", "content": app.get_system_prompt(grade, "Science", language)}, user
+            ])
+            saved_total += before - after
+            rows += 1
+            print(f"{f'answer grade {grade} {language}':<26} {before:8d} {after:8d} {before - after:8d}")
+    fun_fact = count_message_tokens(count, [
+        {"role": "user", "content": app.build_fun_fact_prompt("Science", "4", question["english"], "english")}
+    ])
+    print(f"{'fun fact':<26} {fun_fact:8d} {fun_fact:8d} {0:8d}")
+    saved = saved_total / rows
+    print(f"average saving: {saved:.0f} input tokens per answer, {saved * args.answers_per_day:,.0f} per {args.answers_per_day:,} answers")
+
+# --- UI event graph ---
+
+def bench_events(args):
+    os.environ.setdefault("OPENAI_API_KEY", "sk-mock")
+    os.environ.setdefault("PREBUILD_CONCEPT_AUDIO", "0")
+    import app
+    config = app.build_demo().get_config_file()
+    names = {}
+    for component in config["components"]:
+        props = component["props"]
+        names[component["id"]] = props.get("elem_id") or props.get("label") or props.get("value") or component["type"]
+    dependencies = config["dependencies"]
+    chained = defaultdict(list)
+    change_listeners = defaultdict(list)
+    actions = defaultdict(list)
+    for dependency in dependencies:
+        if dependency["trigger_after"] is not None:
+            chained[dependency["trigger_after"]].append(dependency)
+        for target, event in dependency["targets"]:
+            if target is None:
+                continue
+            actions[(names.get(target, target), event)].append(dependency)
+            if event == "change":
+                change_listeners[target].append(dependency)
+
+    def chain(dependency):
+        yield dependency
+        for then in chained[dependency["id"]]:
+            yield from chain(then)
+
+    def round_trips(dependency):
+        return sum(step["backend_fn"] for step in chain(dependency))
+
+    print(f"{'user action':<36} {'listeners':>9} {'server':>7} {'queued':>7} {'browser':>8} {'+change':>8}")
+    totals = [0, 0, 0, 0, 0]
+    for (name, event), listeners in sorted(actions.items(), key=lambda item: str(item[0])):
+        steps = [step for listener in listeners for step in chain(listener)]
+        server = sum(step["backend_fn"] for step in steps)
+        # Steps that wait behind model calls in the queue, rather than run straight away
+        queued = sum(step["backend_fn"] and step["queue"] is not False for step in steps)
+        browser = sum(1 for step in steps if step["js"] and not step["backend_fn"])
+        # Outputs with a .change listener can set off more round trips when their value changes
+        cascade = sum(
+            round_trips(listener)
+            for output in {output for step in steps if step["backend_fn"] for output in step["outputs"]}
+            for listener in change_listeners[output] if listener not in listeners
+        )
+        row = [len(listeners), server, queued, browser, cascade]
+        totals = [total + value for total, value in zip(totals, row)]
+        print(f"{f'{name}.{event}':<36} {row[0]:9d} {row[1]:7d} {row[2]:7d} {row[3]:8d} {row[4]:8d}")
+    print(f"{'total':<36} {totals[0]:9d} {totals[1]:7d} {totals[2]:7d} {totals[3]:8d} {totals[4]:8d}")
+
+# --- Roman Urdu detection ---
+
+# The detector app.py used before, kept to compare against
+LEGACY_URDU_INDICATORS = [
+    'kya', 'kaise', 'kyun', 'hain', 'nahi', 'batao', 'karna', 'ka', 'ke', 'mein', 'ho', 'toh', 'yeh', 'woh',
+    'hai', 'tha', 'thi', 'hain', 'tum', 'mera', 'apna', 'apne', 'kuch', 'sab', 'koi', 'kab', 'kaun'
+]
+
+def legacy_is_roman_urdu(text):
+    text = text.lower()
+    return sum(word in text for word in LEGACY_URDU_INDICATORS) >= 2
+
+# (question, is Roman Urdu), written the way students type them
+LANGUAGE_CORPUS = [
+    ("What is photosynthesis?", False),
+    ("How do I make a phone call to my teacher?", False),
+    ("Why does the moon change shape every month?", False),
+    ("What makes a rainbow appear after rain?", False),
+    ("Who was the king who built the Badshahi Mosque?", False),
+    ("How does the heart pump blood to the whole body?", False),
+    ("Can you show me how to take away fractions?", False),
+    ("What is the meaning of the word kind?", False),
+    ("Why do some animals sleep through the winter?", False),
+    ("What is agar used for in a science lab?", False),
+    ("Who was Ho Chi Minh?", False),
+    ("Which koala eats the most leaves?", False),
+    ("Tell me a joke about homework", False),
+    ("How many kilometres is it from Karachi to Lahore?", False),
+    ("What is the shape of a honeycomb cell?", False),
+    ("Explain how a kite stays in the air", False),
+    ("What is a mere fraction of a second?", False),
+    ("How do thermometers work?", False),
+    ("Where do whales sleep?", False),
+    ("Can machines think like humans?", False),
+    ("Photosynthesis kya hai?", True),
+    ("Gravity kaise kaam karti hai?", True),
+    ("Yeh fraction kaise solve karte hain?", True),
+    ("Mujhe noun ki definition batao", True),
+    ("Barish kyun hoti hai?", True),
+    ("Chand ki roshni kahan se aati hai?", True),
+    ("Dil khoon ko kaise pump karta hai?", True),
+    ("Pakistan ka sab se bara darya kaun sa hai?", True),
+    ("Mera sawal hai ke plants khana kaise banate hain", True),
+    ("Multiplication ka matlab kya hai?", True),
+    ("Robot kya kar sakta hai?", True),
+    ("Batao volcano kyun phat-ta hai", True),
+    ("Bijli kahan se aati hai", True),
+    ("Aap mujhe angles samjhao", True),
+    ("Kya computer soch sakte hain?", True),
+    ("Sound kaise travel karti hai?", True),
+    ("Iska jawab kya hoga?", True),
+    ("Verb aur noun mein kya farq hai?", True),
+    ("Magnet lohe ko kyun khenchta hai?", True),
+    ("Badal kaise bante hain?", True)
+]
+
+def bench_language(args):
+    import urdu
+    print(f"Roman Urdu detection on {len(LANGUAGE_CORPUS)} labelled questions, {args.repeat} passes")
+    print(f"{'detector':<16} {'accuracy':>9} {'false urdu':>11} {'false eng':>10} {'throughput':>18}")
+    detectors = [
+        ("legacy", legacy_is_roman_urdu),
+        ("word weights", urdu._is_roman_urdu.__wrapped__),
+        ("  memoized", urdu.is_roman_urdu)
+    ]
+    for name, detect in detectors:
+        false_urdu = sum(detect(text) and not label for text, label in LANGUAGE_CORPUS)
+        false_english = sum(label and not detect(text) for text, label in LANGUAGE_CORPUS)
+        accuracy = 1 - (false_urdu + false_english) / len(LANGUAGE_CORPUS)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for text, _ in LANGUAGE_CORPUS:
+                detect(text)
+        rate = args.repeat * len(LANGUAGE_CORPUS) / (time.perf_counter() - start)
+        print(f"{name:<16} {accuracy:9.1%} {false_urdu:11d} {false_english:10d} {rate:12,.0f} /sec")
+    for text, label in LANGUAGE_CORPUS:
+        if urdu.is_roman_urdu(text) != label:
+            print(f"misclassified: {text!r} (score {urdu.urdu_score(text):g})")
+
+# --- LaTeX cleanup ---
+
+def legacy_clean_latex(text):
+    text = re.sub(r'\\\((.*?)\\\)', r'\1', text)
+    text = re.sub(r'\\\[(.*?)\\\]', r'\1', text)
+    text = re.sub(r'\${1,2}(.*?)\${1,2}', r'\1', text)
+    text = text.replace("\\", "")
+    return text
+
+LATEX_ANSWERS = [
+    "Great question! 🌟 Half of a pizza is \\(\\frac{1}{2}\\) of it, and if you eat 2 slices out of 8 you ate $\\frac{2}{8}$! 🍕",
+    "The area is length times width: \\[ A = l \\times w \\] So a 3 by 4 room in Lahore is 12 square metres! 📏",
+    "Speed is distance over time, $$v = \\frac{d}{t}$$ so a bus going 60 km in 1 hour moves at 60 km/h! 🚌",
+    "Plants use sunlight, water and air to make food. This is called photosynthesis! 🌱 Isn't that amazing?"
+]
+
+def bench_latex(args):
+    import latex
+    answers = [(text + " ") * args.length for text in LATEX_ANSWERS]
+    same = sum(latex.clean_latex(text) == legacy_clean_latex(text) for text in answers)
+    print(f"LaTeX cleanup: {len(answers)} answers of ~{sum(map(len, answers)) // len(answers)} characters, {args.repeat} passes")
+    print(f"same output as before on {same} of {len(answers)} answers")
+    print(f"{'cleaner':<34} {'per answer':>12}")
+
+    def run(name, clean_answer):
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for text in answers:
+                clean_answer(text)
+        per_answer = (time.perf_counter() - start) / (args.repeat * len(answers))
+        print(f"{name:<34} {per_answer * 1e6:9.1f} us")
+
+    def chunks(text):
+        return [text[i:i + args.chunk] for i in range(0, len(text), args.chunk)]
+
+    def legacy_stream(text):
+        # Before: the whole answer so far was cleaned again after every chunk
+        answer = ""
+        for chunk in chunks(text):
+            answer += chunk
+            legacy_clean_latex(answer)
+
+    def incremental_stream(text):
+        cleaner = latex.LatexStreamCleaner()
+        for chunk in chunks(text):
+            cleaner.feed(chunk)
+        cleaner.flush()
+
+    run("legacy, whole answer", legacy_clean_latex)
+    run("single pass, whole answer", latex.clean_latex)
+    run(f"legacy, streamed ({args.chunk}-char chunks)", legacy_stream)
+    run("incremental, streamed", incremental_stream)
+
+# --- Text-to-speech backends ---
+
+def bench_tts(args):
+    import tts
+    # Unique sentences so neither our cache nor the remote service can help
+    sentences = [f"{SAMPLE_SENTENCES[i % len(SAMPLE_SENTENCES)]} Number {i}." for i in range(args.sentences)]
+    print(f"TTS: {len(sentences)} sentences, {args.workers} parallel workers")
+    print(f"{'backend':<8} {'p50':>11} {'p95':>11} {'max':>11} {'sequential':>13} {'parallel':>13}")
+    for name in args.backends:
+        try:
+            backend = tts.make_backend(name)
+        except Exception as e:
+            print(f"{name:<8} skipped: {e}")
+            continue
+        with tempfile.TemporaryDirectory() as directory:
+            def synthesize(item):
+                index, sentence = item
+                path = os.path.join(directory, f"{index}{backend.suffix}")
+                start = time.perf_counter()
+                backend.synthesize_to_file(sentence, "en", path)
+                return time.perf_counter() - start
+            try:
+                start = time.perf_counter()
+                latencies = [synthesize(item) for item in enumerate(sentences)]
+                sequential = len(sentences) / (time.perf_counter() - start)
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=args.workers) as pool:
+                    list(pool.map(synthesize, enumerate(sentences, start=len(sentences))))
+                parallel = len(sentences) / (time.perf_counter() - start)
+            except Exception as e:
+                print(f"{name:<8} failed: {e}")
+                continue
+        print(
+            f"{name:<8} {format_ms(percentile(latencies, 50))} {format_ms(percentile(latencies, 95))} "
+            f"{format_ms(max(latencies))} {sequential:8.2f} /sec {parallel:8.2f} /sec"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the Learn AI chatbot")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_mock_options(command):
+        command.add_argument("--latency", type=float, default=0.3, help="seconds before the first token")
+        command.add_argument("--token-delay", type=float, default=0.01, help="seconds between streamed tokens")
+        command.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail with a 500")
+
+    load_parser = commands.add_parser("load", help="drive the handlers with concurrent simulated students")
+    load_parser.add_argument("--students", type=int, default=40)
+    load_parser.add_argument("--rounds", type=int, default=5)
+    load_parser.add_argument("--questions", type=int, default=20, help="distinct questions the class asks")
+    load_parser.add_argument("--tts", action="store_true", help="also press Listen after every answer")
+    load_parser.add_argument("--tts-latency", type=float, default=0.2)
+    load_parser.add_argument("--seed", type=int, default=0)
+    add_mock_options(load_parser)
+    load_parser.set_defaults(run=bench_load)
+
+    server_parser = commands.add_parser("mock-server", help="run the mock OpenAI server on its own")
+    server_parser.add_argument("--port", type=int, default=8765)
+    add_mock_options(server_parser)
+    server_parser.set_defaults(run=run_mock_server)
+
+    prompts_parser = commands.add_parser("prompts", help="count input tokens per request type")
+    prompts_parser.add_argument("--answers-per-day", type=int, default=10000)
+    prompts_parser.set_defaults(run=bench_prompts)
+
+    events_parser = commands.add_parser("events", help="count server round trips per user action")
+    events_parser.set_defaults(run=bench_events)
+
+    language_parser = commands.add_parser("language", help="accuracy and speed of Roman Urdu detection")
+    language_parser.add_argument("--repeat", type=int, default=2000)
+    language_parser.set_defaults(run=bench_language)
+
+    latex_parser = commands.add_parser("latex", help="time LaTeX cleanup of whole and streamed answers")
+    latex_parser.add_argument("--repeat", type=int, default=200)
+    latex_parser.add_argument("--length", type=int, default=4, help="copies of each sample in one answer")
+    latex_parser.add_argument("--chunk", type=int, default=8, help="characters per streamed chunk")
+    latex_parser.set_defaults(run=bench_latex)
+
+    tts_parser = commands.add_parser("tts", help="compare text-to-speech backend latency and throughput")
+    tts_parser.add_argument("--backends", nargs="+", default=["gtts", "espeak"])
+    tts_parser.add_argument("--sentences", type=int, default=20)
+    tts_parser.add_argument("--workers", type=int, default=4)
+    tts_parser.set_defaults(run=bench_tts)
+
+    args = parser.parse_args()
+    args.run(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+import atexit
+import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+# --- Shared response caches ---
+# Answers, topics and fun facts are shared by every session, so a question asked
+# by one student is instant (and free) for the rest of the class.
+
+# Words, numbers (with their decimal point) and arithmetic operators; everything
+# else is sentence punctuation or spacing and is dropped. The operators must stay
+# in the key, or "2+3" and "2-3" would share an answer. Letters and digits are
+# split apart, so "2x3" reads like "2 x 3".
+_token_re = re.compile(r"\d+(?:\.\d+)?|[^\W\d]+|[+\-*/=<>%×÷^]")
+
+def normalize_question(question):
+    return " ".join(_token_re.findall(question.lower()))
+
+def make_index_key(grade, subject, language):
+    return f"{grade}|{subject.lower()}|{language}"
+
+def make_cache_key(grade, subject, language, question):
+    return f"{make_index_key(grade, subject, language)}|{normalize_question(question)}"
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, name, maxsize=1024, ttl=86400):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+class SQLiteCache:
+    """Persistent drop-in for TTLCache, stored in a SQLite file that survives restarts.
+
+    Entries live in one table shared by every cache in the file, partitioned by
+    `name`. Each namespace is capped at `maxsize` rows (least recently used rows
+    go first). `compact()` drops a namespace's expired rows and trims it back to
+    `maxsize`; `vacuum()` returns the freed pages of the whole file to the disk
+    and only needs to run once per file.
+
+    Lookups only read, so a cache hit never waits on another process's write
+    lock. Hits are remembered and written as a batch by the next `set()` (or
+    `compact()`), in the same transaction as the new entry, and on exit.
+    """
+
+    # vacuum() rewrites the whole file, so it only runs when this share of its pages is free
+    VACUUM_FREE_RATIO = 0.25
+
+    def __init__(self, name, path, maxsize=1024, ttl=86400):
+        self.name = name
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._touched = {}
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " name TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, last_access REAL NOT NULL,"
+            " PRIMARY KEY (name, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_lru ON cache (name, last_access)")
+        self._size = self._conn.execute("SELECT COUNT(*) FROM cache WHERE name = ?", (name,)).fetchone()[0]
+        atexit.register(self.flush)
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE name = ? AND key = ?", (self.name, key)
+            ).fetchone()
+            if row is None or row[1] < now:
+                # Expired rows are left for compact() or LRU eviction to delete
+                self.misses += 1
+                return default
+            self._touched[key] = now
+            self.hits += 1
+            return json.loads(row[0])
+
+    def flush(self):
+        with self._lock:
+            self._flush_touches()
+
+    def _flush_touches(self):
+        # Callers hold self._lock
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE cache SET last_access = ? WHERE name = ? AND key = ?",
+                [(last_access, self.name, key) for key, last_access in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._flush_touches()
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO cache (name, key, value, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                    (self.name, key, json.dumps(value), now + self.ttl, now)
+                )
+                if cursor.rowcount:
+                    self._size += 1
+                else:
+                    self._conn.execute(
+                        "UPDATE cache SET value = ?, expires_at = ?, last_access = ? WHERE name = ? AND key = ?",
+                        (json.dumps(value), now + self.ttl, now, self.name, key)
+                    )
+                self._trim()
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _trim(self):
+        # Callers hold self._lock
+        overflow = self._size - self.maxsize
+        if overflow <= 0:
+            return 0
+        self._conn.execute(
+            "DELETE FROM cache WHERE rowid IN ("
+            " SELECT rowid FROM cache WHERE name = ? ORDER BY last_access LIMIT ?)",
+            (self.name, overflow)
+        )
+        self._size -= overflow
+        self.evictions += overflow
+        return overflow
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE name = ?", (self.name,))
+            self._size = 0
+            self._touched.clear()
+
+    def compact(self):
+        with self._lock:
+            self._flush_touches()
+            expired = self._conn.execute(
+                "DELETE FROM cache WHERE name = ? AND expires_at < ?", (self.name, time.time())
+            ).rowcount
+            self._size -= expired
+            # CACHE_MAX_ENTRIES may have been lowered since the rows were written
+            return expired + self._trim()
+
+    def vacuum(self):
+        with self._lock:
+            pages = self._conn.execute("PRAGMA page_count").fetchone()[0]
+            free = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if not free or free < pages * self.VACUUM_FREE_RATIO:
+                return False
+            self._conn.execute("VACUUM")
+            return True
+
+    def __len__(self):
+        return self._size
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+# --- Semantic near-duplicate lookup ---
+# Questions are embedded locally with hashed character n-grams, so "What is
+# photosynthesis?" and "what's photosynthesis" land on the same cached answer
+# without calling an embedding model.
+
+_filler_words = frozenset([
+    "a", "an", "the", "is", "are", "what", "whats", "please", "tell", "me", "about",
+    "kya", "hai", "hain", "hota", "hoti", "ka", "ki", "ke", "mujhe", "batao"
+])
+_math_token_re = re.compile(r"\d+(?:\.\d+)?|[+\-*/=<>%×÷^]|x")
+
+def _math_signature(question):
+    # The numbers and operators of a question, in order
+    return tuple(token for token in normalize_question(question).split() if _math_token_re.fullmatch(token))
+
+def _ngram_vector(question, dims):
+    words = [word for word in normalize_question(question).split() if word not in _filler_words]
+    vector = np.zeros(dims, dtype=np.float32)
+    text = f" {' '.join(words)} "
+    for n in (3, 4):
+        for i in range(len(text) - n + 1):
+            vector[zlib.crc32(text[i:i + n].encode()) % dims] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class _SemanticIndex:
+    __slots__ = ("vectors", "keys", "signatures", "count", "next_slot")
+
+    def __init__(self, dims):
+        self.vectors = np.zeros((32, dims), dtype=np.float32)
+        self.keys = []
+        self.signatures = []
+        self.count = 0
+        self.next_slot = 0
+
+class SemanticCache:
+    """Maps a question to the cache key of a similar question already answered.
+
+    There is one index per (grade, subject, language); each holds at most
+    `capacity` questions and overwrites the oldest once full. Numbers (decimals
+    included) and operators must match exactly and in order, so "2 + 3" never
+    reuses the answer to "2 + 4" or "2 - 3".
+    """
+
+    def __init__(self, threshold=0.9, capacity=512, dims=1024):
+        self.threshold = threshold
+        self.capacity = capacity
+        self.dims = dims
+        self.hits = 0
+        self.misses = 0
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, index_key, question):
+        vector = _ngram_vector(question, self.dims)
+        signature = _math_signature(question)
+        with self._lock:
+            index = self._indexes.get(index_key)
+            if index is not None and index.count:
+                scores = index.vectors[:index.count] @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold and index.signatures[best] == signature:
+                    self.hits += 1
+                    return index.keys[best]
+            self.misses += 1
+            return None
+
+    def add(self, index_key, question, cache_key):
+        vector = _ngram_vector(question, self.dims)
+        with self._lock:
+            index = self._indexes.get(index_key)
+            if index is None:
+                index = self._indexes[index_key] = _SemanticIndex(self.dims)
+            slot = index.next_slot
+            if slot == len(index.keys):
+                # Grow the matrix geometrically until the index reaches capacity
+                if slot == len(index.vectors):
+                    grown = np.zeros((min(2 * slot, self.capacity), self.dims), dtype=np.float32)
+                    grown[:slot] = index.vectors
+                    index.vectors = grown
+                index.keys.append(None)
+                index.signatures.append(None)
+            index.vectors[slot] = vector
+            index.keys[slot] = cache_key
+            index.signatures[slot] = _math_signature(question)
+            index.next_slot = (slot + 1) % self.capacity
+            index.count = min(index.count + 1, self.capacity)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+    def __len__(self):
+        return sum(index.count for index in self._indexes.values())
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "name": "semantic",
+            "size": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": 0,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
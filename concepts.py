@@ -0,0 +1,118 @@
+import bisect
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+# --- AI Learning Mode content ---
+# Concepts are data, not code: they are read from AI_CONCEPTS_PATH (a JSON file
+# with one explanation and one real-life application per grade) the first time
+# AI mode needs them, and checked as they load so a bad edit fails loudly
+# instead of on a student's click. Point AI_CONCEPTS_PATH at another file to
+# serve the concepts in another language.
+
+AI_CONCEPTS_PATH = os.environ.get(
+    "AI_CONCEPTS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "ai_concepts.json")
+)
+
+class Concept:
+    """One concept, with its texts in the order of ConceptStore.grades."""
+
+    __slots__ = ("name", "explanations", "applications")
+
+    def __init__(self, name, explanations, applications):
+        self.name = name
+        self.explanations = explanations
+        self.applications = applications
+
+class ConceptStore:
+    __slots__ = ("grades", "concepts", "_grade_numbers")
+
+    def __init__(self, grades, concepts):
+        self.grades = grades
+        self.concepts = concepts
+        self._grade_numbers = [int(grade) for grade in grades]
+
+    def grade_slot(self, grade):
+        # The texts for the closest grade at or below `grade`; the lowest grade if unknown
+        if not grade or not grade.isdigit():
+            return 0
+        return max(0, bisect.bisect_right(self._grade_numbers, int(grade)) - 1)
+
+    def shuffled_order(self):
+        order = list(range(len(self.concepts)))
+        random.shuffle(order)
+        return order
+
+    def __getitem__(self, index):
+        return self.concepts[index]
+
+    def __iter__(self):
+        return iter(self.concepts)
+
+    def __len__(self):
+        return len(self.concepts)
+
+def _text(value, where):
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f"{where} must be a non-empty string")
+    return value
+
+def _per_grade(texts, grades, where):
+    if not isinstance(texts, dict):
+        raise ValueError(f"{where} must map each grade to a text")
+    unknown = set(texts) - set(grades)
+    if unknown:
+        raise ValueError(f"{where} has texts for unknown grades {', '.join(sorted(unknown))}")
+    return tuple(_text(texts.get(grade), f"{where} for grade {grade}") for grade in grades)
+
+def parse_concepts(data, source="concepts"):
+    if not isinstance(data, dict):
+        raise ValueError(f"{source}: expected an object with 'grades' and 'concepts'")
+    grades = data.get("grades")
+    if not isinstance(grades, list) or not grades or not all(isinstance(grade, str) and grade.isdigit() for grade in grades):
+        raise ValueError(f"{source}: 'grades' must be a non-empty list of grade numbers as strings")
+    if [int(grade) for grade in grades] != sorted({int(grade) for grade in grades}):
+        raise ValueError(f"{source}: 'grades' must be in increasing order without repeats")
+    entries = data.get("concepts")
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"{source}: 'concepts' must be a non-empty list")
+    concepts = []
+    names = set()
+    for number, entry in enumerate(entries, start=1):
+        where = f"{source}: concept {number}"
+        if not isinstance(entry, dict):
+            raise ValueError(f"{where} must be an object")
+        name = _text(entry.get("name"), f"{where} name")
+        if name in names:
+            raise ValueError(f"{where} repeats the name '{name}'")
+        names.add(name)
+        concepts.append(Concept(
+            name,
+            _per_grade(entry.get("explanation"), grades, f"{where} ({name}) explanation"),
+            _per_grade(entry.get("application"), grades, f"{where} ({name}) application")
+        ))
+    return ConceptStore(tuple(grades), tuple(concepts))
+
+def load_concepts(path):
+    start_time = time.perf_counter()
+    with open(path, encoding="utf-8") as f:
+        store = parse_concepts(json.load(f), path)
+    logging.info(
+        f"Loaded {len(store)} AI concepts for grades {', '.join(store.grades)} "
+        f"in {(time.perf_counter() - start_time) * 1000:.1f} ms"
+    )
+    return store
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_concepts():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = load_concepts(AI_CONCEPTS_PATH)
+    return _store
@@ -0,0 +1,102 @@
+import os
+import re
+from collections import deque
+
+# --- Bounded conversation history ---
+# Follow-up questions ("why does it do that?") are sent with the recent turns
+# of the chat, but the prompt never grows with the session: turns that don't
+# fit HISTORY_MAX_TOKENS are left out and, optionally, folded into a one-line
+# summary made from their topics, without another model call. Each session
+# remembers at most HISTORY_MAX_TURNS turns.
+
+HISTORY_MAX_TOKENS = int(os.environ.get("HISTORY_MAX_TOKENS", "600"))
+HISTORY_MAX_TURNS = int(os.environ.get("HISTORY_MAX_TURNS", "6"))
+HISTORY_SUMMARY = os.environ.get("HISTORY_SUMMARY", "1") == "1"
+SUMMARY_MAX_TOPICS = 8
+
+# A follow-up ("why does it do that?", "iska matlab kya hai") points back at the
+# last answer and names nothing of its own. A question that names its own
+# subject ("how does a plant make its food?") stands alone even if it also says
+# "it", so it keeps the shared caches and needs no history.
+
+# Words that point back at an earlier answer, in English and Roman Urdu
+REFERRING_WORDS = frozenset([
+    "it", "its", "it's", "this", "that", "these", "those", "they", "them", "their", "he", "she", "him", "her", "his",
+    "more", "again", "another", "else", "example", "examples",
+    "yeh", "ye", "woh", "wo", "iska", "iski", "iske", "uska", "uski", "uske", "inka", "unka", "phir", "dobara"
+])
+# Question words, helpers and generic verbs that carry no subject of their own
+FUNCTION_WORDS = REFERRING_WORDS | frozenset([
+    "what", "what's", "whats", "why", "how", "when", "where", "who", "which", "whose",
+    "is", "are", "was", "were", "be", "been", "do", "does", "did", "can", "could", "will", "would", "should",
+    "has", "have", "had", "a", "an", "the", "of", "to", "in", "on", "at", "for", "with", "about", "from", "by",
+    "and", "or", "so", "but", "if", "not", "no", "yes", "i", "me", "my", "you", "your", "we", "us", "please",
+    "tell", "explain", "give", "show", "say", "mean", "means", "meaning", "happen", "happens", "work", "works",
+    "make", "makes", "use", "used", "called", "like", "know", "one", "ones", "thing", "things",
+    "also", "too", "very", "much", "many", "some", "any", "other", "same", "then", "there", "here",
+    "kya", "kia", "kaise", "kaisay", "kyun", "kyon", "kyu", "kab", "kahan", "kaun", "kon",
+    "hai", "hain", "tha", "thi", "thay", "ho", "hota", "hoti", "hote", "karta", "karte", "karti", "karo", "kar",
+    "ka", "ki", "ke", "ko", "se", "mein", "par", "pe", "bhi", "toh", "na", "nahi", "nahin", "un",
+    "mujhe", "mera", "meri", "batao", "bataen", "samjhao", "matlab", "ek", "aur", "kuch", "zyada"
+])
+
+_word_re = re.compile(r"[a-z0-9']+")
+
+def estimate_tokens(text):
+    # About 4 characters per token, plus the chat format's per-message overhead
+    return len(text) // 4 + 4
+
+def _label(turn):
+    question, _, topic, _ = turn
+    return topic or question[:40]
+
+def is_follow_up(question):
+    words = _word_re.findall(question.lower())
+    return any(word in REFERRING_WORDS for word in words) and all(word in FUNCTION_WORDS for word in words)
+
+class ConversationHistory:
+    """The last few question/answer turns of one session."""
+
+    __slots__ = ("turns", "earlier_topics", "max_tokens", "summarize")
+
+    def __init__(self, max_turns=HISTORY_MAX_TURNS, max_tokens=HISTORY_MAX_TOKENS, summarize=HISTORY_SUMMARY):
+        self.turns = deque(maxlen=max_turns)
+        self.earlier_topics = deque(maxlen=SUMMARY_MAX_TOPICS)
+        self.max_tokens = max_tokens
+        self.summarize = summarize
+
+    def add(self, question, answer, topic=None):
+        if len(self.turns) == self.turns.maxlen:
+            label = _label(self.turns[0])
+            if label not in self.earlier_topics:
+                self.earlier_topics.append(label)
+        self.turns.append((question, answer, topic, estimate_tokens(question) + estimate_tokens(answer)))
+
+    def messages(self, question):
+        """Chat messages for `question`, preceded by as many recent turns as fit the token budget."""
+        turns = list(self.turns)
+        budget = self.max_tokens - estimate_tokens(question)
+        start = len(turns)
+        while start > 0 and turns[start - 1][3] <= budget:
+            start -= 1
+            budget -= turns[start][3]
+        messages = []
+        dropped = list(self.earlier_topics) + [_label(turn) for turn in turns[:start]]
+        if self.summarize and dropped:
+            topics = ", ".join(dict.fromkeys(dropped))
+            messages.append({"role": "system", "content": f"Earlier in this chat the student asked about: {topics}."})
+        for turn_question, answer, _, _ in turns[start:]:
+            messages.append({"role": "user", "content": turn_question})
+            messages.append({"role": "assistant", "content": answer})
+        messages.append({"role": "user", "content": question})
+        return messages
+
+    def last_topic(self):
+        return _label(self.turns[-1]) if self.turns else None
+
+    def clear(self):
+        self.turns.clear()
+        self.earlier_topics.clear()
+
+    def __len__(self):
+        return len(self.turns)
@@ -0,0 +1,62 @@
+import re
+
+# --- LaTeX cleanup ---
+# The model sometimes answers with \( \), \[ \], $ or $$ math even though the
+# prompt asks for plain numbers. One compiled pattern unwraps every delimiter
+# pair (including pairs nested in each other) and drops stray backslashes in a
+# single pass. Inline math never spans a line; display math may.
+
+_latex_re = re.compile(r"\\\((.*?)\\\)|\\\[([\s\S]*?)\\\]|\$\$([\s\S]*?)\$\$|\$(.*?)\$|\\")
+# The same, plus lone dollar signs, to find delimiters still waiting for their closer
+_open_re = re.compile(_latex_re.pattern + r"|\$")
+
+def _unwrap(match):
+    if match.lastindex is None:
+        return ""
+    return _latex_re.sub(_unwrap, match.group(match.lastindex))
+
+def clean_latex(text):
+    return _latex_re.sub(_unwrap, text)
+
+class LatexStreamCleaner:
+    """Cleans a streamed answer chunk by chunk.
+
+    Text from an opening delimiter whose closer hasn't arrived yet is held back,
+    so a formula split across chunks is never shown half cleaned. Inline math is
+    released at the next line break and anything else after MAX_HOLD characters,
+    as it will not be closed; clean the whole text once the stream ends to get
+    exactly what clean_latex would give.
+    """
+
+    __slots__ = ("pending",)
+
+    MAX_HOLD = 400
+
+    def __init__(self):
+        self.pending = ""
+
+    def feed(self, chunk):
+        self.pending += chunk
+        end = self._safe_end()
+        text, self.pending = self.pending[:end], self.pending[end:]
+        return clean_latex(text)
+
+    def flush(self):
+        text, self.pending = self.pending, ""
+        return clean_latex(text)
+
+    def _safe_end(self):
+        pending = self.pending
+        for match in _open_re.finditer(pending):
+            start, token = match.start(), match.group()
+            if match.end() == len(pending):
+                # A delimiter at the very end may still grow: "$" into "$$", "\" into "\("
+                return start
+            if len(pending) - start > self.MAX_HOLD:
+                continue
+            opener = pending[start:start + 2] if token == "\\" else token
+            if opener in ("\\[", "$$"):
+                return start
+            if opener in ("\\(", "$") and "\n" not in pending[start:]:
+                return start
+        return len(pending)
@@ -0,0 +1,215 @@
+import asyncio
+import bisect
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- In-process metrics ---
+# Latency histograms and counters kept in memory and served in the Prometheus
+# text format on METRICS_PORT (or logged every METRICS_LOG_INTERVAL seconds).
+# With METRICS=0 the decorators return the undecorated function and every
+# recording call returns immediately.
+
+METRICS_ENABLED = os.environ.get("METRICS", "1") == "1"
+
+# Seconds, roughly log-spaced from 1 ms to 1 minute
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class Histogram:
+    __slots__ = ("counts", "count", "total")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+_histograms = {}
+_counters = {}
+_collectors = []
+_lock = threading.Lock()
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def observe(name, seconds, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+def increment(name, value=1, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def register_collector(collect):
+    """Add a callable returning (name, labels, value) tuples, read at export time."""
+    _collectors.append(collect)
+
+@contextmanager
+def timer(name, **labels):
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+def timed(handler):
+    """Record a handler's latency in handler_seconds{handler=...}.
+
+    Works for plain functions, coroutines and (async) generators; generators
+    also report the time to their first update in handler_first_update_seconds.
+    """
+    def decorate(fn):
+        if not METRICS_ENABLED:
+            return fn
+        if inspect.isasyncgenfunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                first = True
+                try:
+                    async for item in fn(*args, **kwargs):
+                        if first:
+                            observe("handler_first_update_seconds", time.perf_counter() - start, handler=handler)
+                            first = False
+                        yield item
+                finally:
+                    observe("handler_seconds", time.perf_counter() - start, handler=handler)
+        elif inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                first = True
+                try:
+                    for item in fn(*args, **kwargs):
+                        if first:
+                            observe("handler_first_update_seconds", time.perf_counter() - start, handler=handler)
+                            first = False
+                        yield item
+                finally:
+                    observe("handler_seconds", time.perf_counter() - start, handler=handler)
+        elif asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    observe("handler_seconds", time.perf_counter() - start, handler=handler)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    observe("handler_seconds", time.perf_counter() - start, handler=handler)
+        return wrapper
+    return decorate
+
+def record_usage(call, usage):
+    if usage is None:
+        return
+    increment("openai_tokens_total", usage.prompt_tokens, call=call, kind="prompt")
+    increment("openai_tokens_total", usage.completion_tokens, call=call, kind="completion")
+
+# --- Export ---
+
+def _format_labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in items) + "}"
+
+def render():
+    with _lock:
+        histograms = {key: (list(h.counts), h.count, h.total) for key, h in _histograms.items()}
+        counters = dict(_counters)
+    lines = []
+    for (name, labels), (counts, count, total) in sorted(histograms.items()):
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS, counts):
+            cumulative += bucket_count
+            lines.append(f"{name}_bucket{_format_labels(labels, le=bound)} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(labels, le='+Inf')} {count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {total:.6f}")
+        lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    for (name, labels), value in sorted(counters.items()):
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    for collect in _collectors:
+        try:
+            for name, labels, value in collect():
+                lines.append(f"{name}{_format_labels(tuple(sorted(labels.items())))} {value}")
+        except Exception as e:
+            logging.error(f"Metrics collector failed: {e}")
+    return "\n".join(lines) + "\n"
+
+def summary():
+    with _lock:
+        items = sorted(_histograms.items())
+        return [
+            f"{name}{_format_labels(labels)} n={h.count} mean={h.total / h.count:.3f}s "
+            f"p50<={h.quantile(0.5)}s p95<={h.quantile(0.95)}s p99<={h.quantile(0.99)}s"
+            for (name, labels), h in items if h.count
+        ]
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server(port, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logging.info(f"Metrics available at http://{host}:{port}/metrics")
+    return server
+
+def start_periodic_dump(interval):
+    def dump():
+        while True:
+            time.sleep(interval)
+            for line in summary():
+                logging.info(f"metrics {line}")
+    threading.Thread(target=dump, name="metrics-dump", daemon=True).start()
@@ -0,0 +1,113 @@
+import asyncio
+
+import metrics
+
+# --- Request coalescing ---
+# When a whole class asks the same question at once, only the first request
+# calls the model; everyone else with the same key waits on (or follows the
+# stream of) that one call. A call is cancelled once nobody is waiting for it
+# any more, as cancelling a single request did before.
+
+class FlightCancelled(Exception):
+    """The shared call was cancelled before it finished."""
+
+class _Flight:
+    __slots__ = ("task", "waiters", "items", "done", "error", "condition")
+
+    def __init__(self):
+        self.task = None
+        self.waiters = 0
+        self.items = []
+        self.done = False
+        self.error = None
+        self.condition = asyncio.Condition()
+
+class SingleFlight:
+    """Shares one running call per key between concurrent callers.
+
+    Must be used from a single event loop. A key of None never shares.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._flights = {}
+
+    def _join(self, key, start):
+        flight = self._flights.get(key) if key is not None else None
+        if flight is not None:
+            metrics.increment("coalesced_requests_total", call=self.name)
+            return flight
+        flight = _Flight()
+        flight.task = asyncio.create_task(start(flight))
+        if key is not None:
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        return flight
+
+    def _forget(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _leave(self, key, flight):
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.task.done():
+            # Forgotten first, so a caller arriving while the task winds down starts a fresh call
+            self._forget(key, flight)
+            flight.task.cancel()
+
+    async def run(self, key, factory):
+        """Await `factory()`, or the call already running for `key`."""
+        flight = self._join(key, lambda _: factory())
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.task.cancelled():
+                raise FlightCancelled(self.name) from None
+            raise
+        finally:
+            self._leave(key, flight)
+
+    async def stream(self, key, factory):
+        """Yield the items of the async iterator `factory()`, shared by everyone following `key`.
+
+        Late followers get the items produced so far straight away.
+        """
+        flight = self._join(key, lambda flight: self._pump(flight, factory))
+        flight.waiters += 1
+        seen = 0
+        try:
+            while True:
+                async with flight.condition:
+                    await flight.condition.wait_for(lambda: len(flight.items) > seen or flight.done)
+                    items, done = flight.items[seen:], flight.done
+                seen += len(items)
+                for item in items:
+                    yield item
+                if done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+        finally:
+            self._leave(key, flight)
+
+    async def _pump(self, flight, factory):
+        try:
+            async for item in factory():
+                async with flight.condition:
+                    flight.items.append(item)
+                    flight.condition.notify_all()
+        except Exception as e:
+            flight.error = e
+        except asyncio.CancelledError:
+            # Followers must not mistake the items so far for a complete answer
+            flight.error = FlightCancelled(self.name)
+            raise
+        finally:
+            # Also reached on cancellation, so nobody is left waiting
+            async with flight.condition:
+                flight.done = True
+                flight.condition.notify_all()
+
+    def __len__(self):
+        return len(self._flights)
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import metrics
+
+# --- Speech-to-text ---
+# Recognition runs on a small bounded worker pool instead of the request thread.
+# Audio is downsampled to 16 kHz mono 16-bit and silence is trimmed first, which
+# shrinks the upload to Google (or the work for the offline engine).
+# speech_recognition is imported on the first recording, not at startup.
+
+STT_BACKEND = os.environ.get("STT_BACKEND", "google")
+STT_WORKERS = int(os.environ.get("STT_WORKERS", "4"))
+STT_MAX_PENDING = int(os.environ.get("STT_MAX_PENDING", "32"))
+STT_TIMEOUT = float(os.environ.get("STT_TIMEOUT", "15"))  # seconds
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+SILENCE_RMS = 300  # int16 amplitude below which a frame counts as silence
+PADDING_FRAMES = 5  # keep a little silence around speech so words aren't clipped
+
+class TranscriptionBusy(Exception):
+    pass
+
+class NoSpeechDetected(Exception):
+    pass
+
+def recognize_google(recognizer, audio):
+    return recognizer.recognize_google(audio)
+
+def recognize_sphinx(recognizer, audio):
+    # Offline, needs the pocketsphinx package
+    return recognizer.recognize_sphinx(audio)
+
+STT_BACKENDS = {
+    "google": recognize_google,
+    "sphinx": recognize_sphinx
+}
+
+if STT_BACKEND not in STT_BACKENDS:
+    raise ValueError(f"Unknown STT_BACKEND '{STT_BACKEND}', expected one of {', '.join(STT_BACKENDS)}")
+
+_executor = ThreadPoolExecutor(max_workers=STT_WORKERS, thread_name_prefix="stt")
+_pending = 0
+_pending_lock = threading.Lock()
+_local = threading.local()
+
+def get_recognizer():
+    # One recognizer per worker thread, reused across requests
+    recognizer = getattr(_local, "recognizer", None)
+    if recognizer is None:
+        import speech_recognition as sr
+        recognizer = _local.recognizer = sr.Recognizer()
+        recognizer.operation_timeout = STT_TIMEOUT
+    return recognizer
+
+def trim_silence(samples):
+    frame = SAMPLE_RATE * FRAME_MS // 1000
+    frames = len(samples) // frame
+    if frames == 0:
+        return samples
+    rms = np.sqrt(np.mean(samples[:frames * frame].reshape(frames, frame).astype(np.float32) ** 2, axis=1))
+    voiced = np.flatnonzero(rms > SILENCE_RMS)
+    if len(voiced) == 0:
+        return samples[:0]
+    start = max(0, voiced[0] - PADDING_FRAMES) * frame
+    end = min(frames, voiced[-1] + 1 + PADDING_FRAMES) * frame
+    return samples[start:end]
+
+def preprocess(audio):
+    import speech_recognition as sr
+    raw = audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2)
+    samples = trim_silence(np.frombuffer(raw, dtype=np.int16))
+    if len(samples) == 0:
+        raise NoSpeechDetected()
+    return sr.AudioData(samples.tobytes(), SAMPLE_RATE, 2)
+
+def transcribe(path):
+    import speech_recognition as sr
+    recognizer = get_recognizer()
+    with sr.AudioFile(path) as source:
+        audio = recognizer.record(source)
+    audio = preprocess(audio)
+    logging.debug("Transcribing %.1f seconds of speech with %s", len(audio.frame_data) / 2 / SAMPLE_RATE, STT_BACKEND)
+    with metrics.timer("stt_recognition_seconds", backend=STT_BACKEND):
+        return STT_BACKENDS[STT_BACKEND](recognizer, audio)
+
+def _release(_future):
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+async def transcribe_async(path):
+    global _pending
+    with _pending_lock:
+        if _pending >= STT_MAX_PENDING:
+            raise TranscriptionBusy()
+        _pending += 1
+    try:
+        future = _executor.submit(transcribe, path)
+    except BaseException:
+        _release(None)
+        raise
+    # Released when the worker is done, not when we stop waiting: a timed-out
+    # recognition still occupies the pool until it returns
+    future.add_done_callback(_release)
+    return await asyncio.wait_for(asyncio.wrap_future(future), timeout=STT_TIMEOUT)
@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Keep the tests away from the real audio cache directory
+os.environ.setdefault("AUDIO_CACHE_DIR", tempfile.mkdtemp(prefix="learn_ai_tts_test_"))
@@ -0,0 +1,153 @@
+import cache
+from cache import SemanticCache, SQLiteCache, TTLCache, make_cache_key, make_index_key
+
+def key(question):
+    return make_cache_key("4", "Math", "english", question)
+
+def test_operators_give_distinct_keys():
+    questions = ["What is 2+3?", "What is 2-3?", "What is 2*3?", "What is 2/3?", "What is 2%3?", "What is 2^3?"]
+    assert len({key(question) for question in questions}) == len(questions)
+
+def test_fraction_sums_and_differences_differ():
+    assert key("1/2 + 1/4") != key("1/2 - 1/4")
+
+def test_comparisons_differ():
+    assert key("Is 5 > 3?") != key("Is 5 < 3?")
+    assert key("Is 2+2 = 4?") != key("Is 2+2 4?")
+
+def test_decimals_are_kept():
+    assert key("What is 2.5 x 4?") != key("What is 25 x 4?")
+    assert key("What is 2x3?") == key("what is 2 x 3")
+    assert key("What is 2x3?") != key("What is 2x4?")
+
+def test_sentence_punctuation_and_spacing_are_ignored():
+    assert key("What is 2+3?") == key("what is 2 + 3")
+    assert key("  Why is the sky blue?!") == key("why is the sky blue.")
+
+def test_grade_subject_and_language_are_part_of_the_key():
+    assert key("What is 2+3?") != make_cache_key("5", "Math", "english", "What is 2+3?")
+    assert key("What is 2+3?") != make_cache_key("4", "Science", "english", "What is 2+3?")
+    assert key("What is 2+3?") != make_cache_key("4", "Math", "urdu", "What is 2+3?")
+
+def test_compact_drops_expired_rows_and_trims_to_maxsize(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SQLiteCache("answer", path, maxsize=10)
+    for number in range(10):
+        cache.set(f"q{number}", f"a{number}")
+    cache.get("q0")
+    cache.flush()
+    cache._conn.execute("UPDATE cache SET expires_at = 0 WHERE key = 'q9'")
+
+    # Reopened with a smaller CACHE_MAX_ENTRIES
+    cache = SQLiteCache("answer", path, maxsize=5)
+    assert cache.compact() == 5
+    assert len(cache) == 5
+    assert cache.get("q9") is None
+    assert cache.get("q0") == "a0"
+    assert cache.get("q1") is None
+
+def test_compact_leaves_other_namespaces_alone(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    answers = SQLiteCache("answer", path, maxsize=1)
+    topics = SQLiteCache("topic", path, maxsize=3)
+    for number in range(3):
+        topics.set(f"q{number}", f"t{number}")
+    answers.compact()
+    assert len(SQLiteCache("topic", path, maxsize=3)) == 3
+
+def test_vacuum_only_runs_when_enough_space_is_free(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SQLiteCache("answer", path, maxsize=1000)
+    for number in range(500):
+        cache.set(f"q{number}", "x" * 200)
+    assert not cache.vacuum()
+    cache.clear()
+    assert cache.vacuum()
+    assert not cache.vacuum()
+
+def semantic_cache_with(question):
+    semantic = SemanticCache()
+    semantic.add(make_index_key("4", "Math", "english"), question, key(question))
+    return semantic
+
+def test_semantic_cache_matches_reworded_questions():
+    semantic = semantic_cache_with("What is photosynthesis?")
+    assert semantic.lookup(make_index_key("4", "Math", "english"), "what's photosynthesis") == key("What is photosynthesis?")
+
+def test_semantic_cache_never_matches_different_arithmetic():
+    index_key = make_index_key("4", "Math", "english")
+    semantic = semantic_cache_with("What is 2+3?")
+    for question in ("What is 2-3?", "What is 2*3?", "What is 2/3?", "What is 2+4?", "What is 2.3?", "What is 3+2?"):
+        assert semantic.lookup(index_key, question) is None, question
+    assert semantic.lookup(index_key, "what is 2 + 3") == key("What is 2+3?")
+    semantic = semantic_cache_with("Is 5 > 3?")
+    assert semantic.lookup(index_key, "Is 5 < 3?") is None
+
+def test_ttl_cache_evicts_the_least_recently_used_entry():
+    answers = TTLCache("answer", maxsize=2)
+    answers.set("a", 1)
+    answers.set("b", 2)
+    assert answers.get("a") == 1
+    answers.set("c", 3)
+    assert answers.get("b") is None
+    assert answers.get("a") == 1 and answers.get("c") == 3
+    assert len(answers) == 2
+    assert answers.evictions == 1
+
+def test_ttl_cache_overwriting_refreshes_an_entry():
+    answers = TTLCache("answer", maxsize=2)
+    answers.set("a", 1)
+    answers.set("b", 2)
+    answers.set("a", 10)
+    answers.set("c", 3)
+    assert answers.get("a") == 10
+    assert answers.get("b") is None
+
+def test_ttl_cache_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    answers = TTLCache("answer", maxsize=10, ttl=60)
+    answers.set("a", 1)
+    now[0] += 59
+    assert answers.get("a") == 1
+    now[0] += 2
+    assert answers.get("a", "expired") == "expired"
+    assert len(answers) == 0
+
+def test_ttl_cache_counts_hits_and_misses():
+    answers = TTLCache("answer", maxsize=10)
+    answers.set("a", 1)
+    answers.get("a")
+    answers.get("a")
+    answers.get("b")
+    stats = answers.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (2, 1, 1)
+    assert abs(stats["hit_rate"] - 2 / 3) < 1e-9
+    answers.clear()
+    assert len(answers) == 0
+    assert TTLCache("empty").stats()["hit_rate"] == 0.0
+
+def test_sqlite_cache_hits_do_not_write(tmp_path):
+    answers = SQLiteCache("answer", str(tmp_path / "cache.sqlite3"), maxsize=10)
+    answers.set("a", {"text": "answer"})
+    changes = answers._conn.total_changes
+    assert answers.get("a") == {"text": "answer"}
+    assert answers.get("missing") is None
+    assert answers._conn.total_changes == changes
+    assert (answers.hits, answers.misses) == (1, 1)
+
+def test_sqlite_cache_batched_hits_still_drive_eviction(tmp_path):
+    answers = SQLiteCache("answer", str(tmp_path / "cache.sqlite3"), maxsize=2)
+    answers.set("a", 1)
+    answers.set("b", 2)
+    assert answers.get("a") == 1
+    answers.set("c", 3)
+    assert answers.get("b") is None
+    assert answers.get("a") == 1 and answers.get("c") == 3
+
+def test_sqlite_cache_entries_expire(tmp_path):
+    answers = SQLiteCache("answer", str(tmp_path / "cache.sqlite3"), maxsize=10, ttl=-1)
+    answers.set("a", 1)
+    assert answers.get("a", "expired") == "expired"
+    assert answers.compact() == 1
+    assert len(answers) == 0
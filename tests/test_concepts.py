@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from concepts import AI_CONCEPTS_PATH, load_concepts, parse_concepts
+
+def concept(name, grades=("3", "5")):
+    return {
+        "name": name,
+        "explanation": {grade: f"{name} explained for grade {grade}" for grade in grades},
+        "application": {grade: f"{name} used in grade {grade}" for grade in grades}
+    }
+
+def test_the_shipped_concepts_load():
+    store = load_concepts(AI_CONCEPTS_PATH)
+    assert len(store) > 0
+    assert store.grades == ("3", "4", "5", "6")
+
+def test_grade_slot_picks_the_closest_grade_at_or_below():
+    store = parse_concepts({"grades": ["3", "5"], "concepts": [concept("Robots")]})
+    assert [store.grade_slot(grade) for grade in ("3", "4", "5", "6")] == [0, 0, 1, 1]
+    assert store.grade_slot("1") == 0
+    assert store.grade_slot("Select Grade") == 0
+    assert store.grade_slot(None) == 0
+    assert store[0].explanations[store.grade_slot("6")] == "Robots explained for grade 5"
+
+def test_shuffled_order_covers_every_concept():
+    store = parse_concepts({"grades": ["3", "5"], "concepts": [concept(name) for name in "ABCDE"]})
+    assert sorted(store.shuffled_order()) == list(range(5))
+    assert [item.name for item in store] == list("ABCDE")
+
+@pytest.mark.parametrize("data, message", [
+    ([], "expected an object"),
+    ({"grades": [], "concepts": [concept("A")]}, "'grades' must be"),
+    ({"grades": ["5", "3"], "concepts": [concept("A")]}, "increasing order"),
+    ({"grades": ["3", "5"], "concepts": []}, "'concepts' must be"),
+    ({"grades": ["3", "5"], "concepts": [concept("A"), concept("A")]}, "repeats the name"),
+    ({"grades": ["3", "5"], "concepts": [concept("A", grades=("3",))]}, "for grade 5"),
+    ({"grades": ["3", "5"], "concepts": [concept("A", grades=("3", "4", "5"))]}, "unknown grades 4"),
+    ({"grades": ["3", "5"], "concepts": [{**concept("A"), "name": " "}]}, "name must be"),
+])
+def test_invalid_files_fail_loudly(data, message):
+    with pytest.raises(ValueError, match=message):
+        parse_concepts(data)
+
+def test_load_concepts_reports_the_file(tmp_path):
+    path = tmp_path / "concepts.json"
+    path.write_text(json.dumps({"grades": ["3"], "concepts": []}), encoding="utf-8")
+    with pytest.raises(ValueError, match="concepts.json"):
+        load_concepts(str(path))
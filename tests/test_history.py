@@ -0,0 +1,65 @@
+from history import ConversationHistory, is_follow_up
+
+def test_follow_up_questions():
+    assert is_follow_up("Why does it do that?")
+    assert is_follow_up("Another example")
+    assert is_follow_up("Tell me more about it")
+    assert is_follow_up("Can you explain it again?")
+    assert is_follow_up("iska matlab kya hai")
+    assert is_follow_up("Ye kaise hota hai?")
+
+def test_questions_that_name_their_own_subject_stand_alone():
+    assert not is_follow_up("What is photosynthesis?")
+    assert not is_follow_up("How does a plant make its food?")
+    assert not is_follow_up("Give me an example of a noun")
+    assert not is_follow_up("Define photosynthesis")
+    assert not is_follow_up("What is 5 + 3?")
+    assert not is_follow_up("Yeh fraction kaise solve karte hain?")
+    assert not is_follow_up("Photosynthesis aur respiration mein kya farq hai?")
+
+def test_messages_keep_the_recent_turns_in_order():
+    conversation = ConversationHistory(max_turns=6, max_tokens=1000)
+    conversation.add("What is a plant?", "A living thing.", "Plants")
+    conversation.add("What is the sun?", "A star.", "Sun")
+    messages = conversation.messages("Why is it hot?")
+    assert [message["content"] for message in messages] == [
+        "What is a plant?", "A living thing.", "What is the sun?", "A star.", "Why is it hot?"
+    ]
+    assert [message["role"] for message in messages] == ["user", "assistant", "user", "assistant", "user"]
+
+def test_messages_stay_within_the_token_budget_and_summarize_the_rest():
+    conversation = ConversationHistory(max_turns=6, max_tokens=100)
+    for number in range(4):
+        conversation.add(f"Question {number}?", "x" * 200, f"Topic {number}")
+    messages = conversation.messages("And this one?")
+    assert messages[0] == {"role": "system", "content": "Earlier in this chat the student asked about: Topic 0, Topic 1, Topic 2."}
+    assert [message["content"] for message in messages[1:]] == ["Question 3?", "x" * 200, "And this one?"]
+
+def test_turns_beyond_max_turns_are_remembered_by_topic():
+    conversation = ConversationHistory(max_turns=2, max_tokens=1000)
+    for number in range(3):
+        conversation.add(f"Question {number}?", "Answer.", f"Topic {number}")
+    assert len(conversation) == 2
+    assert conversation.messages("More?")[0]["content"].endswith("asked about: Topic 0.")
+
+def test_summary_can_be_turned_off():
+    conversation = ConversationHistory(max_turns=1, max_tokens=1000, summarize=False)
+    conversation.add("Question 0?", "Answer.", "Topic 0")
+    conversation.add("Question 1?", "Answer.", "Topic 1")
+    assert all(message["role"] != "system" for message in conversation.messages("More?"))
+
+def test_clear():
+    conversation = ConversationHistory(max_turns=1)
+    conversation.add("Question 0?", "Answer.")
+    conversation.add("Question 1?", "Answer.")
+    conversation.clear()
+    assert len(conversation) == 0
+    assert conversation.messages("Hi") == [{"role": "user", "content": "Hi"}]
+
+def test_last_topic_falls_back_to_the_question():
+    conversation = ConversationHistory()
+    assert conversation.last_topic() is None
+    conversation.add("What is gravity?", "A pull.", "Gravity")
+    assert conversation.last_topic() == "Gravity"
+    conversation.add("Why do magnets stick to fridges?", "Magnetism.")
+    assert conversation.last_topic() == "Why do magnets stick to fridges?"
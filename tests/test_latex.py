@@ -0,0 +1,39 @@
+from latex import LatexStreamCleaner, clean_latex
+
+ANSWERS = [
+    "Plain answer with no math! 🌟",
+    "Half of 10 is \\(10 \\div 2 = 5\\)!",
+    "The area is \\[5 \\times 4 = 20\\] square metres.",
+    "We write $$a + b$$ and $x = 3$ for short.",
+    "Nested \\(\\text{$2 + 2$}\\) math.",
+    "It costs $5 and more \\(unclosed",
+    "Line one $half\nline two $ end",
+]
+
+def test_clean_latex_unwraps_delimiters():
+    assert clean_latex("Half of 10 is \\(10 \\div 2 = 5\\)!") == "Half of 10 is 10 div 2 = 5!"
+    assert clean_latex("The area is \\[5 \\times 4 = 20\\] m.") == "The area is 5 times 4 = 20 m."
+    assert clean_latex("We write $$a + b$$ and $x = 3$.") == "We write a + b and x = 3."
+    assert clean_latex("Nested \\(\\text{$2 + 2$}\\) math.") == "Nested text{2 + 2} math."
+
+def test_clean_latex_leaves_plain_text_alone():
+    assert clean_latex("Plain answer with no math! 🌟") == "Plain answer with no math! 🌟"
+
+def stream(text, size):
+    cleaner = LatexStreamCleaner()
+    shown = "".join(cleaner.feed(text[i:i + size]) for i in range(0, len(text), size))
+    return shown, shown + cleaner.flush()
+
+def test_streaming_gives_the_same_text_as_cleaning_at_once():
+    for answer in ANSWERS:
+        for size in (1, 2, 3, 7, 100):
+            assert stream(answer, size)[1] == clean_latex(answer), (answer, size)
+
+def test_streaming_holds_back_unclosed_formulas():
+    shown, _ = stream("Half is \\(1 \\div 2", 1)
+    assert shown == "Half is "
+
+def test_streaming_never_shows_a_half_cleaned_delimiter():
+    for answer in ANSWERS:
+        shown, _ = stream(answer, 1)
+        assert "\\" not in shown, answer
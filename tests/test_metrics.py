@@ -0,0 +1,91 @@
+import asyncio
+
+import metrics
+from metrics import BUCKETS, Histogram
+
+def test_histogram_quantiles_are_bucket_upper_bounds():
+    histogram = Histogram()
+    for value in (0.002, 0.002, 0.04, 0.3, 20.0):
+        histogram.observe(value)
+    assert histogram.count == 5
+    assert abs(histogram.total - 20.344) < 1e-9
+    assert histogram.quantile(0.4) == 0.0025
+    assert histogram.quantile(0.5) == 0.05
+    assert histogram.quantile(0.8) == 0.5
+    assert histogram.quantile(1.0) == 30.0
+
+def test_histogram_overflow_and_empty():
+    histogram = Histogram()
+    assert histogram.quantile(0.5) == 0.0
+    histogram.observe(BUCKETS[-1] * 2)
+    assert histogram.quantile(0.5) == float("inf")
+
+def test_render_prometheus_text():
+    metrics.observe("test_render_seconds", 0.003, call="answer")
+    metrics.increment("test_render_total", 2, call="answer")
+    metrics.increment("test_render_total", call="answer")
+    lines = metrics.render().splitlines()
+    assert 'test_render_seconds_bucket{call="answer",le="0.0025"} 0' in lines
+    assert 'test_render_seconds_bucket{call="answer",le="0.005"} 1' in lines
+    assert 'test_render_seconds_bucket{call="answer",le="+Inf"} 1' in lines
+    assert 'test_render_seconds_count{call="answer"} 1' in lines
+    assert 'test_render_total{call="answer"} 3' in lines
+
+def test_render_survives_a_failing_collector():
+    def broken():
+        raise RuntimeError("boom")
+    metrics.register_collector(broken)
+    metrics.register_collector(lambda: [("test_collected", {"name": "answer"}, 7)])
+    try:
+        assert 'test_collected{name="answer"} 7' in metrics.render().splitlines()
+    finally:
+        metrics._collectors.clear()
+
+def count(handler, name="handler_seconds"):
+    return metrics._histograms[metrics._key(name, {"handler": handler})].count
+
+def test_timed_functions_and_coroutines():
+    @metrics.timed("test_plain")
+    def plain(value):
+        return value + 1
+
+    @metrics.timed("test_coroutine")
+    async def coroutine(value):
+        return value + 1
+
+    assert plain(1) == 2
+    assert asyncio.run(coroutine(1)) == 2
+    assert plain.__name__ == "plain"
+    assert count("test_plain") == 1
+    assert count("test_coroutine") == 1
+
+def test_timed_generators_report_the_first_update():
+    @metrics.timed("test_generator")
+    def generator():
+        yield 1
+        yield 2
+
+    @metrics.timed("test_async_generator")
+    async def async_generator():
+        yield 1
+        yield 2
+
+    async def collect():
+        return [item async for item in async_generator()]
+
+    assert list(generator()) == [1, 2]
+    assert asyncio.run(collect()) == [1, 2]
+    for handler in ("test_generator", "test_async_generator"):
+        assert count(handler) == 1
+        assert count(handler, "handler_first_update_seconds") == 1
+
+def test_timed_records_failures_too():
+    @metrics.timed("test_failure")
+    def failing():
+        raise ValueError("boom")
+
+    try:
+        failing()
+    except ValueError:
+        pass
+    assert count("test_failure") == 1
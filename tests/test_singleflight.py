@@ -0,0 +1,163 @@
+import asyncio
+
+import pytest
+
+from singleflight import FlightCancelled, SingleFlight
+
+def test_run_shares_one_call_per_key():
+    calls = []
+
+    async def answer():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def main():
+        flights = SingleFlight("test")
+        results = await asyncio.gather(*(flights.run("key", answer) for _ in range(5)))
+        assert len(flights) == 0
+        return results
+
+    assert asyncio.run(main()) == ["answer"] * 5
+    assert len(calls) == 1
+
+def test_a_key_of_none_never_shares():
+    calls = []
+
+    async def answer():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def main():
+        flights = SingleFlight("test")
+        await asyncio.gather(flights.run(None, answer), flights.run(None, answer))
+
+    asyncio.run(main())
+    assert len(calls) == 2
+
+def test_late_followers_get_the_whole_stream():
+    calls = []
+
+    async def chunks():
+        calls.append(1)
+        for chunk in ("a", "b", "c"):
+            await asyncio.sleep(0.01)
+            yield chunk
+
+    async def follow(flights, delay):
+        await asyncio.sleep(delay)
+        return [chunk async for chunk in flights.stream("key", chunks)]
+
+    async def main():
+        flights = SingleFlight("test")
+        return await asyncio.gather(follow(flights, 0), follow(flights, 0.015))
+
+    assert asyncio.run(main()) == [["a", "b", "c"], ["a", "b", "c"]]
+    assert len(calls) == 1
+
+def test_stream_errors_reach_every_follower():
+    async def chunks():
+        yield "a"
+        raise RuntimeError("boom")
+
+    async def follow(flights):
+        try:
+            return [chunk async for chunk in flights.stream("key", chunks)]
+        except RuntimeError as e:
+            return str(e)
+
+    async def main():
+        flights = SingleFlight("test")
+        return await asyncio.gather(follow(flights), follow(flights))
+
+    assert asyncio.run(main()) == ["boom", "boom"]
+
+def test_the_call_is_cancelled_once_nobody_waits():
+    cancelled = []
+
+    async def answer():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def main():
+        flights = SingleFlight("test")
+        waiters = [asyncio.create_task(flights.run("key", answer)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        waiters[0].cancel()
+        await asyncio.sleep(0.01)
+        assert not cancelled
+        waiters[1].cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    assert cancelled == [1]
+
+def test_a_caller_joining_after_the_last_waiter_left_starts_a_fresh_stream():
+    calls = []
+
+    async def chunks():
+        calls.append(1)
+        for chunk in ("a", "b", "c"):
+            yield chunk
+            await asyncio.sleep(0.01)
+
+    async def main():
+        flights = SingleFlight("test")
+        first = flights.stream("key", chunks)
+        assert await first.__anext__() == "a"
+        # The only waiter leaves (e.g. Clear) and a classmate asks the same thing at once
+        await first.aclose()
+        return [chunk async for chunk in flights.stream("key", chunks)]
+
+    assert asyncio.run(main()) == ["a", "b", "c"]
+    assert len(calls) == 2
+
+def test_a_caller_joining_after_the_last_waiter_left_gets_a_fresh_result():
+    calls = []
+
+    async def answer():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def main():
+        flights = SingleFlight("test")
+        first = asyncio.create_task(flights.run("key", answer))
+        await asyncio.sleep(0)
+        first.cancel()
+        # Let the first caller leave, but not the shared call finish winding down
+        await asyncio.sleep(0)
+        assert first.cancelled()
+        return await flights.run("key", answer)
+
+    assert asyncio.run(main()) == "answer"
+    assert len(calls) == 2
+
+def test_followers_of_a_cancelled_stream_raise_instead_of_ending_early():
+    async def chunks():
+        yield "a"
+        await asyncio.sleep(10)
+        yield "b"
+
+    async def main():
+        flights = SingleFlight("test")
+        received = []
+
+        async def follow():
+            async for chunk in flights.stream("key", chunks):
+                received.append(chunk)
+
+        follower = asyncio.create_task(follow())
+        await asyncio.sleep(0.01)
+        # Cancel the shared call itself, not the follower
+        flights._flights["key"].task.cancel()
+        with pytest.raises(FlightCancelled):
+            await follower
+        return received
+
+    assert asyncio.run(main()) == ["a"]
@@ -0,0 +1,60 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+import speech
+from speech import FRAME_MS, PADDING_FRAMES, SAMPLE_RATE, trim_silence
+
+FRAME = SAMPLE_RATE * FRAME_MS // 1000
+
+def recording(*parts):
+    # (frames, amplitude) pairs of a square wave, silent when the amplitude is 0
+    return np.concatenate([
+        (np.where(np.arange(frames * FRAME) % 2, amplitude, -amplitude)).astype(np.int16) for frames, amplitude in parts
+    ])
+
+def test_silence_around_speech_is_trimmed_with_padding():
+    samples = recording((20, 0), (10, 5000), (20, 0))
+    trimmed = trim_silence(samples)
+    assert len(trimmed) == (10 + 2 * PADDING_FRAMES) * FRAME
+    assert np.abs(trimmed).max() == 5000
+
+def test_padding_stops_at_the_edges():
+    samples = recording((2, 0), (10, 5000), (1, 0))
+    assert len(trim_silence(samples)) == len(samples)
+
+def test_pauses_inside_speech_are_kept():
+    samples = recording((10, 5000), (30, 0), (10, 5000))
+    assert len(trim_silence(samples)) == len(samples)
+
+def test_only_silence_gives_no_samples():
+    assert len(trim_silence(recording((20, 0), (5, 100)))) == 0
+
+def test_recordings_shorter_than_a_frame_are_left_alone():
+    samples = np.full(FRAME - 1, 5000, dtype=np.int16)
+    assert len(trim_silence(samples)) == FRAME - 1
+
+def test_timed_out_recognitions_still_count_as_pending(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(speech, "transcribe", lambda path: release.wait(5) and "hello")
+    monkeypatch.setattr(speech, "STT_TIMEOUT", 0.01)
+    monkeypatch.setattr(speech, "STT_MAX_PENDING", 1)
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await speech.transcribe_async("a.wav")
+        # The first recognition is still running, so the pool is full
+        with pytest.raises(speech.TranscriptionBusy):
+            await speech.transcribe_async("b.wav")
+        release.set()
+        for _ in range(100):
+            if speech._pending == 0:
+                break
+            await asyncio.sleep(0.01)
+        monkeypatch.setattr(speech, "STT_TIMEOUT", 5)
+        return await speech.transcribe_async("c.wav")
+
+    assert asyncio.run(main()) == "hello"
+    assert speech._pending == 0
@@ -0,0 +1,95 @@
+import os
+import threading
+
+import tts
+from tts import AudioStore, split_sentences
+
+def write_clip(directory, name, size):
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    return path
+
+def test_clips_are_evicted_least_recently_used_first(tmp_path):
+    directory = str(tmp_path)
+    store = AudioStore(directory, max_bytes=1000, max_files=3)
+    first, second, third = (write_clip(directory, f"{name}.mp3", 10) for name in ("a", "b", "c"))
+    for path in (first, second, third):
+        store.add(path)
+    assert store.lookup(first)
+    store.add(write_clip(directory, "d.mp3", 10))
+    assert second not in store
+    assert not os.path.exists(second)
+    assert first in store and third in store
+    assert store.evictions == 1
+
+def test_the_byte_budget_is_enforced(tmp_path):
+    directory = str(tmp_path)
+    store = AudioStore(directory, max_bytes=250, max_files=100)
+    for name in "abc":
+        store.add(write_clip(directory, f"{name}.mp3", 100))
+    assert store.stats()["files"] == 2
+    assert store.bytes_used == 200
+
+def test_the_newest_clip_is_kept_even_when_too_big(tmp_path):
+    directory = str(tmp_path)
+    store = AudioStore(directory, max_bytes=50, max_files=100)
+    store.add(write_clip(directory, "a.mp3", 10))
+    big = write_clip(directory, "b.mp3", 100)
+    store.add(big)
+    assert big in store
+    assert store.stats()["files"] == 1
+
+def test_startup_keeps_the_lru_order_and_drops_partial_files(tmp_path):
+    directory = str(tmp_path)
+    old, new = write_clip(directory, "old.mp3", 10), write_clip(directory, "new.mp3", 10)
+    os.utime(old, (1, 1))
+    partial = write_clip(directory, "x.mp3.1.2.part", 10)
+    store = AudioStore(directory, max_bytes=1000, max_files=1)
+    assert not os.path.exists(partial)
+    assert new in store and old not in store
+
+def test_lookup_counts_hits_and_misses(tmp_path):
+    directory = str(tmp_path)
+    store = AudioStore(directory, max_bytes=1000, max_files=10)
+    path = write_clip(directory, "a.mp3", 10)
+    store.add(path)
+    assert store.lookup(path)
+    assert not store.lookup(os.path.join(directory, "missing.mp3"))
+    os.remove(path)
+    assert not store.lookup(path)
+    assert store.stats()["hits"] == 1 and store.stats()["misses"] == 2
+
+def test_split_sentences_at_sentence_ends_and_line_breaks():
+    text = "Plants make their own food from sunlight. They also need water!\nIsn't that amazing for a plant?"
+    assert split_sentences(text) == [
+        "Plants make their own food from sunlight.", "They also need water! Isn't that amazing for a plant?"
+    ]
+
+def test_short_fragments_ride_along_with_the_previous_chunk():
+    assert split_sentences("Wow! Plants are alive and they grow every day.") == [
+        "Wow! Plants are alive and they grow every day."
+    ]
+    assert split_sentences("Hi. Yes. Ok.") == ["Hi. Yes. Ok."]
+
+def test_split_sentences_skips_blank_text():
+    assert split_sentences("") == []
+    assert split_sentences("  \n\n ") == []
+    assert split_sentences("3.5 is a decimal number, not the end of a sentence.") == [
+        "3.5 is a decimal number, not the end of a sentence."
+    ]
+
+def test_warm_cache_builds_each_missing_sentence_once(monkeypatch):
+    built = []
+    monkeypatch.setattr(tts, "synthesize", lambda text, lang="en": built.append(text))
+    texts = ["Robots help people every single day at home. They are fun!", "Robots help people every single day at home."]
+    for parallel in (False, True):
+        built.clear()
+        assert tts.warm_cache(texts, parallel=parallel) == 2
+        assert sorted(built) == ["Robots help people every single day at home.", "They are fun!"]
+
+def test_warm_cache_runs_in_the_calling_thread_by_default(monkeypatch):
+    threads = []
+    monkeypatch.setattr(tts, "synthesize", lambda text, lang="en": threads.append(threading.current_thread()))
+    tts.warm_cache(["One sentence that is long enough to stand alone.", "Another sentence that is long enough to stand."])
+    assert threads == [threading.current_thread()] * 2
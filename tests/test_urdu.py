@@ -0,0 +1,24 @@
+from urdu import is_roman_urdu, urdu_score
+
+def test_roman_urdu_questions():
+    assert is_roman_urdu("Photosynthesis kya hai?")
+    assert is_roman_urdu("Mujhe fractions samjhao")
+    assert is_roman_urdu("paani ka rang ko kaise batate")
+
+def test_english_questions():
+    assert not is_roman_urdu("How do you make a phone call?")
+    assert not is_roman_urdu("What is the shape of the Earth?")
+    assert not is_roman_urdu("Who is Koi the fish?")
+
+def test_words_are_matched_whole():
+    # "ka" inside "make" and "ho" inside "phone" do not count
+    assert urdu_score("make a phone") == 0
+
+def test_weak_words_alone_are_not_enough():
+    assert urdu_score("ka") == 1
+    assert urdu_score("kya") == 2
+
+def test_empty_or_invalid_input():
+    assert not is_roman_urdu("")
+    assert not is_roman_urdu(None)
+    assert not is_roman_urdu(42)
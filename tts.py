@@ -0,0 +1,248 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+# --- Content-addressed text-to-speech cache ---
+# Audio is stored under a hash of (language, text), so a sentence is only ever
+# synthesized once: the fixed AI concept texts can be prebuilt, and answers are
+# cached the first time a student presses "Listen".
+
+AUDIO_CACHE_DIR = os.environ.get("AUDIO_CACHE_DIR", os.path.join(tempfile.gettempdir(), "learn_ai_tts"))
+AUDIO_CACHE_MAX_BYTES = int(os.environ.get("AUDIO_CACHE_MAX_MB", "200")) * 1024 * 1024
+AUDIO_CACHE_MAX_FILES = int(os.environ.get("AUDIO_CACHE_MAX_FILES", "2000"))
+TTS_WORKERS = int(os.environ.get("TTS_WORKERS", "4"))
+TTS_BACKEND = os.environ.get("TTS_BACKEND", "gtts")
+
+# --- Speech backends ---
+# gTTS calls Google's online service; espeak runs locally, needs no network and
+# scales with the number of cores.
+
+class GTTSBackend:
+    name = "gtts"
+    suffix = ".mp3"
+
+    def synthesize_to_file(self, text, lang, path):
+        from gtts import gTTS
+        gTTS(text, lang=lang).save(path)
+
+class EspeakBackend:
+    name = "espeak"
+    suffix = ".wav"
+
+    def __init__(self):
+        self.executable = shutil.which("espeak-ng") or shutil.which("espeak")
+        if self.executable is None:
+            raise RuntimeError("TTS_BACKEND=espeak needs espeak-ng or espeak on the PATH")
+
+    def synthesize_to_file(self, text, lang, path):
+        subprocess.run(
+            [self.executable, "-v", lang, "-w", path, "--", text],
+            check=True, capture_output=True, timeout=30
+        )
+
+TTS_BACKENDS = {
+    "gtts": GTTSBackend,
+    "espeak": EspeakBackend
+}
+
+def make_backend(name):
+    if name not in TTS_BACKENDS:
+        raise ValueError(f"Unknown TTS_BACKEND '{name}', expected one of {', '.join(TTS_BACKENDS)}")
+    return TTS_BACKENDS[name]()
+
+AUDIO_SUFFIXES = tuple(backend.suffix for backend in TTS_BACKENDS.values())
+
+class AudioStore:
+    """A directory of audio clips capped by total bytes and file count.
+
+    Clips are evicted least recently used first. The file mtime doubles as the
+    access time, so the LRU order survives restarts. Leftover partial files from
+    a crash are removed on startup.
+    """
+
+    def __init__(self, directory, max_bytes, max_files):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if not name.endswith(AUDIO_SUFFIXES):
+                    os.remove(path)
+                    continue
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, path, stat.st_size))
+        with self._lock:
+            for _, path, size in sorted(entries):
+                self._files[path] = size
+                self.bytes_used += size
+            self._evict()
+        logging.info(f"Audio cache: {len(self._files)} clips, {self.bytes_used / 1024 / 1024:.1f} MB in {self.directory}")
+
+    def path_for(self, text, lang, backend):
+        digest = hashlib.sha256(f"{backend.name}\0{lang}\0{text}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}{backend.suffix}")
+
+    def lookup(self, path):
+        with self._lock:
+            if path in self._files:
+                try:
+                    os.utime(path)
+                except OSError:
+                    self.bytes_used -= self._files.pop(path)
+                else:
+                    self._files.move_to_end(path)
+                    self.hits += 1
+                    return True
+            self.misses += 1
+            return False
+
+    def add(self, path):
+        size = os.path.getsize(path)
+        with self._lock:
+            self.bytes_used += size - self._files.pop(path, 0)
+            self._files[path] = size
+            self._evict()
+
+    def _evict(self):
+        # Never evict the most recent clip: it is about to be played
+        while len(self._files) > 1 and (self.bytes_used > self.max_bytes or len(self._files) > self.max_files):
+            path, size = self._files.popitem(last=False)
+            self.bytes_used -= size
+            self.evictions += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def __contains__(self, path):
+        return path in self._files
+
+    def stats(self):
+        return {
+            "files": len(self._files),
+            "bytes_used": self.bytes_used,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+audio_store = AudioStore(AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_BYTES, AUDIO_CACHE_MAX_FILES)
+backend = make_backend(TTS_BACKEND)
+
+_key_locks = {}
+_key_locks_lock = threading.Lock()
+
+def synthesize(text, lang="en"):
+    path = audio_store.path_for(text, lang, backend)
+    if audio_store.lookup(path):
+        return path
+    # One lock per clip, so concurrent clicks on the same text share one synthesis
+    with _key_locks_lock:
+        lock = _key_locks.setdefault(path, threading.Lock())
+    try:
+        with lock:
+            if os.path.exists(path):
+                return path
+            partial = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+            try:
+                with metrics.timer("tts_synthesis_seconds", backend=backend.name):
+                    backend.synthesize_to_file(text, lang, partial)
+                os.replace(partial, path)
+            except Exception:
+                if os.path.exists(partial):
+                    os.remove(partial)
+                raise
+            audio_store.add(path)
+            logging.debug("Synthesized %d characters to %s", len(text), path)
+            return path
+    finally:
+        with _key_locks_lock:
+            _key_locks.pop(path, None)
+
+# --- Sentence-chunked synthesis ---
+# Long texts are split into sentences that are synthesized in parallel; the
+# first clip can start playing while the rest are still being generated.
+
+_executor = ThreadPoolExecutor(max_workers=TTS_WORKERS, thread_name_prefix="tts")
+_sentence_end_re = re.compile(r"(?<=[.!?])\s+|\n+")
+MIN_CHUNK_CHARS = 40
+
+def split_sentences(text):
+    chunks = []
+    for sentence in _sentence_end_re.split(text.strip()):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        # Tiny fragments ("Wow!", an emoji line) ride along with the previous chunk
+        if chunks and len(chunks[-1]) < MIN_CHUNK_CHARS:
+            chunks[-1] = f"{chunks[-1]} {sentence}"
+        else:
+            chunks.append(sentence)
+    return chunks
+
+def synthesize_chunks(text, lang="en"):
+    futures = [_executor.submit(synthesize, chunk, lang) for chunk in split_sentences(text)]
+    try:
+        for future in futures:
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+async def synthesize_chunks_async(text, lang="en"):
+    futures = [_executor.submit(synthesize, chunk, lang) for chunk in split_sentences(text)]
+    try:
+        for future in futures:
+            yield await asyncio.wrap_future(future)
+    finally:
+        for future in futures:
+            future.cancel()
+
+def warm_cache(texts, lang="en", parallel=False):
+    """Synthesize every sentence of `texts` that isn't cached yet; returns the number built.
+
+    By default the clips are built one at a time in the calling thread, so a
+    warm-up running next to live traffic never takes a worker from "Listen" or
+    sends the speech service a burst. `parallel` uses the shared pool instead,
+    for prebuilding while nothing else runs.
+    """
+    chunks = []
+    for text in texts:
+        chunks.extend(chunk for chunk in split_sentences(text) if audio_store.path_for(chunk, lang, backend) not in audio_store)
+    chunks = list(dict.fromkeys(chunks))
+    futures = [_executor.submit(synthesize, chunk, lang) for chunk in chunks] if parallel else None
+    built = 0
+    for index, chunk in enumerate(chunks):
+        try:
+            if futures is None:
+                synthesize(chunk, lang)
+            else:
+                futures[index].result()
+            built += 1
+        except Exception as e:
+            logging.error(f"Error prebuilding audio for '{chunk[:40]}': {e}")
+    return built
@@ -0,0 +1,39 @@
+import functools
+import os
+import re
+
+# --- Roman Urdu detection ---
+# Questions are split into words with one compiled regex and each word is looked
+# up in a weight table, so "ka" no longer matches inside "make" or "ho" inside
+# "phone". Words that only occur in Urdu count 2; short ones that are also
+# English words or names count 1. Results are memoized per question text.
+
+URDU_THRESHOLD = float(os.environ.get("URDU_THRESHOLD", "2"))
+URDU_CACHE_SIZE = 4096
+
+STRONG_WORDS = (
+    "kya", "kia", "kaise", "kaisay", "kyun", "kyon", "kyu", "kaun", "kon", "kab", "kahan", "kitna", "kitne", "kitni",
+    "hai", "hain", "tha", "thi", "thay", "hota", "hoti", "hotay", "hote", "nahi", "nahin", "bhi", "aur",
+    "batao", "bataen", "bataiye", "samjhao", "samjhaen", "karna", "karta", "karte", "karti", "kaam", "matlab",
+    "mein", "mujhe", "mera", "meri", "apna", "apni", "apne", "tum", "aap", "kuch", "yeh", "woh",
+    "iska", "iski", "iske", "uska", "uski", "uske", "kyunke", "lekin", "sakta", "sakte", "sakti", "chahiye",
+    "wala", "wali", "walay", "hamari", "hamara", "tumhara"
+)
+# Also English words or names, so one of them alone is not enough
+WEAK_WORDS = ("ka", "ke", "ki", "ko", "se", "ho", "toh", "sab", "koi", "ye", "wo", "par", "pe", "na", "hum", "mere", "agar")
+
+WEIGHTS = {**{word: 1.0 for word in WEAK_WORDS}, **{word: 2.0 for word in STRONG_WORDS}}
+
+_word_re = re.compile(r"[a-z]+")
+
+def urdu_score(text):
+    return sum(WEIGHTS.get(word, 0.0) for word in _word_re.findall(text.lower()))
+
+@functools.lru_cache(maxsize=URDU_CACHE_SIZE)
+def _is_roman_urdu(text):
+    return urdu_score(text) >= URDU_THRESHOLD
+
+def is_roman_urdu(text):
+    if not text or not isinstance(text, str):
+        return False
+    return _is_roman_urdu(text)